@@ -37,12 +37,14 @@ logger = logging.getLogger("autopentest")
 console = Console()
 
 class AutoPentest:
-    def __init__(self, target, level=1, output=None, quiet=False, bypass_waf=False):
+    def __init__(self, target, level=1, output=None, quiet=False, bypass_waf=False, use_cache=True, include_appendix=False):
         self.target = target
         self.level = level
         self.output_dir = output or f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         self.quiet = quiet
         self.bypass_waf = bypass_waf
+        self.use_cache = use_cache
+        self.include_appendix = include_appendix
         self.results = {}
         
         # 创建输出目录
@@ -89,39 +91,40 @@ class AutoPentest:
         """WAF检测和绕过"""
         console.print("[bold blue]正在检测WAF...[/bold blue]")
         
-        waf_bypass = WAFBypass()
-        waf_info = waf_bypass.detect_waf(f"http://{self.target}")
-        
-        if waf_info['detected']:
-            console.print(f"[yellow]检测到WAF: {', '.join(waf_info['waf_types'])}[/yellow]")
-            
-            # 生成并测试绕过payload
-            original_payloads = [
-                "' OR '1'='1",
-                "UNION SELECT NULL--",
-                "../../etc/passwd"
-            ]
-            
-            for waf_type in waf_info['waf_types']:
-                for payload in original_payloads:
-                    bypass_payloads = waf_bypass.generate_bypass_payloads(payload, waf_type)
-                    waf_bypass.test_bypass(f"http://{self.target}", bypass_payloads)
+        # 退出时关闭HTTP客户端，异常时同样释放连接
+        with WAFBypass() as waf_bypass:
+            waf_info = waf_bypass.detect_waf(f"http://{self.target}")
             
-            # 保存有效的绕过payload
-            self.results['waf_bypass'] = {
-                'waf_info': waf_info,
-                'effective_payloads': waf_bypass.get_effective_payloads()
-            }
-            
-            # 导出结果
-            waf_bypass.export_results(os.path.join(self.output_dir, 'waf_bypass.json'))
-        else:
-            console.print("[green]未检测到WAF[/green]")
+            if waf_info['detected']:
+                console.print(f"[yellow]检测到WAF: {', '.join(waf_info['waf_types'])}[/yellow]")
+                
+                # 生成并测试绕过payload
+                original_payloads = [
+                    "' OR '1'='1",
+                    "UNION SELECT NULL--",
+                    "../../etc/passwd"
+                ]
+                
+                for waf_type in waf_info['waf_types']:
+                    for payload in original_payloads:
+                        bypass_payloads = waf_bypass.generate_bypass_payloads(payload, waf_type)
+                        waf_bypass.test_bypass(f"http://{self.target}", bypass_payloads)
+                
+                # 保存有效的绕过payload
+                self.results['waf_bypass'] = {
+                    'waf_info': waf_info,
+                    'effective_payloads': waf_bypass.get_effective_payloads()
+                }
+                
+                # 导出结果
+                waf_bypass.export_results(os.path.join(self.output_dir, 'waf_bypass.json'))
+            else:
+                console.print("[green]未检测到WAF[/green]")
     
     def _info_gathering(self):
         """信息收集阶段"""
         console.print("[bold blue]正在进行信息收集...[/bold blue]")
-        info_gatherer = InfoGathering(self.target)
+        info_gatherer = InfoGathering(self.target, use_cache=self.use_cache)
         self.results['info_gathering'] = info_gatherer.gather_all()
     
     def _port_scan(self):
@@ -215,13 +218,22 @@ class AutoPentest:
         """生成报告"""
         console.print("[bold blue]正在生成报告...[/bold blue]")
         
-        report_generator = ReportGenerator(self.target, self.results)
-        
-        # 生成HTML报告
-        report_generator.generate_html(os.path.join(self.output_dir, 'report.html'))
+        try:
+            report_generator = ReportGenerator(self.target, self.results, self.include_appendix)
+        except Exception:
+            logger.exception("报告数据准备失败")
+            return
         
-        # 生成PDF报告
-        report_generator.generate_pdf(os.path.join(self.output_dir, 'report.pdf'))
+        # 各格式互不依赖，单个格式失败时继续生成其余报告
+        for generate, filename in (
+            (report_generator.generate_html, 'report.html'),  # HTML报告
+            (report_generator.generate_pdf, 'report.pdf'),    # PDF报告
+            (report_generator.generate_json, 'report.json')   # 原始扫描数据
+        ):
+            try:
+                generate(os.path.join(self.output_dir, filename))
+            except Exception:
+                logger.exception(f"报告生成失败: {filename}")
         
         console.print(f"[green]报告已生成在目录: {self.output_dir}[/green]")
 
@@ -233,6 +245,8 @@ def main():
     parser.add_argument("--quiet", action="store_true", help="静默模式")
     parser.add_argument("--docker", action="store_true", help="在Docker中运行")
     parser.add_argument("--bypass-waf", action="store_true", help="启用WAF绕过模式")
+    parser.add_argument("--no-cache", action="store_true", help="不使用WHOIS/DNS查询缓存")
+    parser.add_argument("--appendix", action="store_true", help="在HTML/PDF报告中附带原始扫描数据")
     
     args = parser.parse_args()
     
@@ -242,7 +256,9 @@ def main():
             level=args.level,
             output=args.output,
             quiet=args.quiet,
-            bypass_waf=args.bypass_waf
+            bypass_waf=args.bypass_waf,
+            use_cache=not args.no_cache,
+            include_appendix=args.appendix
         )
         pentest.start()
     except KeyboardInterrupt:
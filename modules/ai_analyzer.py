@@ -1,49 +1,265 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
+import csv
+import importlib
+import orjson
 import os
-from typing import Dict, Any, List
+import re
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
 from rich.console import Console
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import pandas as pd
+
+if TYPE_CHECKING:
+    import torch
 
 console = Console()
 
+_DEFAULT_MODEL = "TinyLlama/TinyLlama-1.1B-intermediate-step-1431k-3T"
+
+# 预量化的4bit TinyLlama权重
+_QUANTIZED_MODELS = {
+    'awq': "TheBloke/TinyLlama-1.1B-Chat-v1.0-AWQ",
+    'gptq': "TheBloke/TinyLlama-1.1B-Chat-v1.0-GPTQ"
+}
+
+# Transformers量化KV缓存支持的精度
+_HF_KV_CACHE_NBITS = {
+    'int8': 8,
+    'int4': 4
+}
+
+# 量化KV缓存后端 (Transformers后端名, 依赖模块, 支持的位数)，按优先级排列
+_HF_KV_CACHE_BACKENDS = (
+    ('HQQ', 'hqq', frozenset({2, 4, 8})),
+    ('quanto', 'optimum.quanto', frozenset({2, 4}))
+)
+
+# 编译模式下预分配静态KV缓存的固定形状，生成按该批大小分批并补齐
+_GENERATE_BATCH_SIZE = 8
+_STATIC_CACHE_LEN = 1024
+# 编译模式下提示长度按该倍数填充，限制预填充阶段的重新编译次数
+_PROMPT_LENGTH_MULTIPLE = 64
+
+# 漏洞预测提示中的固定部分
+_VULN_PROMPT_PREFIX = "基于以下扫描结果，分析可能存在的漏洞：\n\n"
+_VULN_PROMPT_SUFFIX = (
+    "\n请分析上述信息，识别潜在的安全漏洞，包括：\n"
+    "1. 常见漏洞（如CVE）\n"
+    "2. 配置错误\n"
+    "3. 过时的软件版本\n"
+    "4. 不安全的服务\n"
+)
+
+# 预测结果分类规则
+_CVE_RE = re.compile(r'CVE-\d+')
+_MISCONFIGURATION_RE = re.compile(r'配置|错误|misconfiguration', re.IGNORECASE)
+_VERSION_RE = re.compile(r'版本|version|outdated', re.IGNORECASE)
+
+# 严重性关键字，按优先级从高到低匹配
+_SEVERITY_PATTERNS = (
+    ('critical', re.compile(r'严重|critical|rce|远程代码', re.IGNORECASE)),
+    ('high', re.compile(r'高危|high', re.IGNORECASE)),
+    ('medium', re.compile(r'中危|medium', re.IGNORECASE))
+)
+
 class AIAnalyzer:
-    def __init__(self, model_path: str = "TinyLlama/TinyLlama-1.1B-intermediate-step-1431k-3T"):
-        """初始化AI分析器"""
+    def __init__(self, model_path: Optional[str] = None,
+                 backend: str = "vllm", compile_model: bool = False,
+                 kv_cache_dtype: Optional[str] = None, quantization: Optional[str] = None):
+        """初始化AI分析器
+
+        backend 为 "vllm" 时使用vLLM引擎批量推理，未安装vLLM时回退到Transformers；
+        compile_model 仅对Transformers后端生效，启用torch.compile和静态KV缓存；
+        kv_cache_dtype 启用KV缓存量化，vLLM支持 "fp8"/"fp8_e5m2"，Transformers支持 "int8"/"int4"；
+        quantization 为 "awq" 或 "gptq" 时加载4bit量化权重，未指定model_path时使用对应的预量化模型
+        """
         self.results: Dict[str, Any] = {}
+        self.backend = backend
+        self.compile_model = compile_model
+        self.kv_cache_dtype = kv_cache_dtype
+        self.quantization = quantization
+        
+        if model_path is None:
+            model_path = _QUANTIZED_MODELS.get(quantization, _DEFAULT_MODEL)
         
         try:
-            # 加载模型和分词器
-            self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_path,
-                torch_dtype=torch.float16,
-                device_map="auto"
-            )
+            if self.backend == "vllm":
+                try:
+                    self._load_vllm(model_path)
+                except ImportError:
+                    console.print("[yellow]未安装vLLM，回退到Transformers后端[/yellow]")
+                    self.backend = "transformers"
+            
+            if self.backend != "vllm":
+                self._load_transformers(model_path)
             console.print("[green]AI模型加载成功[/green]")
         except Exception as e:
             console.print(f"[red]AI模型加载失败: {str(e)}[/red]")
             raise
     
-    def predict_vulnerabilities(self, scan_results: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """预测可能存在的漏洞"""
+    def _load_vllm(self, model_path: str) -> None:
+        """加载vLLM推理引擎"""
+        from vllm import LLM, SamplingParams
+        
+        self.llm = LLM(
+            model=model_path,
+            dtype="float16",
+            gpu_memory_utilization=0.85,
+            kv_cache_dtype=self.kv_cache_dtype or "auto",
+            quantization=self.quantization,
+            # 每次预测共享相同的提示前缀，复用其KV缓存
+            enable_prefix_caching=True
+        )
+        self._sampling_params = SamplingParams
+    
+    def _load_transformers(self, model_path: str) -> None:
+        """加载Transformers模型和分词器"""
+        # 延迟导入，未使用AI分析时不承担torch/transformers的导入开销
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        
+        self._torch = torch
+        self._static_cache = None
+        self._eager_forward = None
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        # 批量生成需要左侧填充，TinyLlama未定义pad token，复用eos
+        self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.tokenizer.padding_side = "left"
+        # 预量化权重的量化配置随模型一起加载，激活值保持fp16
+        self.model = AutoModelForCausalLM.from_pretrained(
+            model_path,
+            torch_dtype=torch.float16,
+            device_map="auto"
+        )
+        
+        if self.kv_cache_dtype:
+            self._configure_kv_cache_quantization()
+        
+        if self.compile_model:
+            self._compile_model()
+    
+    def _configure_kv_cache_quantization(self) -> None:
+        """为Transformers后端启用量化KV缓存"""
+        nbits = _HF_KV_CACHE_NBITS.get(self.kv_cache_dtype)
+        if nbits is None:
+            console.print(f"[yellow]Transformers后端不支持KV缓存类型 {self.kv_cache_dtype}，使用默认精度[/yellow]")
+            return
+        
+        if self.compile_model:
+            console.print("[yellow]量化KV缓存与静态缓存编译不兼容，已忽略KV缓存量化[/yellow]")
+            return
+        
+        # 量化后端依赖在generate时才会导入，缺失时错误被预测流程吞掉，这里提前检查
+        for backend, module, supported_nbits in _HF_KV_CACHE_BACKENDS:
+            if nbits not in supported_nbits:
+                continue
+            try:
+                importlib.import_module(module)
+            except ImportError:
+                continue
+            self.model.generation_config.cache_implementation = "quantized"
+            self.model.generation_config.cache_config = {'backend': backend, 'nbits': nbits}
+            return
+        
+        console.print(f"[yellow]未安装hqq或optimum-quanto，{self.kv_cache_dtype} KV缓存量化不可用，使用默认缓存[/yellow]")
+    
+    def _compile_model(self) -> None:
+        """编译模型前向计算，编译失败时保持eager模式"""
+        if self.quantization == 'awq':
+            console.print("[yellow]AWQ量化内核与torch.compile兼容性较差，建议使用GPTQ[/yellow]")
+        
+        self._eager_forward = self.model.forward
         try:
-            # 构建提示
-            prompt = self._build_vulnerability_prompt(scan_results)
+            import torch._inductor.config as inductor_config
+            from transformers import StaticCache
+            inductor_config.coordinate_descent_tuning = True
+            inductor_config.triton.unique_kernel_names = True
+            
+            # 预分配固定形状的静态KV缓存并在每次生成时复用，解码阶段张量形状不变，避免重复编译
+            self._static_cache = StaticCache(
+                config=self.model.config,
+                max_batch_size=_GENERATE_BATCH_SIZE,
+                max_cache_len=_STATIC_CACHE_LEN,
+                device=self.model.device,
+                dtype=self.model.dtype
+            )
+            self.model.forward = self._torch.compile(
+                self.model.forward,
+                mode="reduce-overhead",
+                fullgraph=True,
+                dynamic=False
+            )
             
-            # 生成预测
-            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+            # 预热，按固定批大小和缓存长度提前触发编译
+            console.print("[blue]正在编译AI模型...[/blue]")
+            self._generate(["warmup"], max_tokens=8)
+        except Exception as e:
+            console.print(f"[yellow]模型编译失败，使用eager模式: {str(e)}[/yellow]")
+            self.model.forward = self._eager_forward
+            self._static_cache = None
+    
+    def _generate(self, prompts: List[str], max_tokens: int) -> List[str]:
+        """批量生成文本，仅返回新生成的部分"""
+        if self.backend == "vllm":
+            # temperature为0即贪心解码
+            sampling = self._sampling_params(temperature=0, max_tokens=max_tokens)
+            outputs = self.llm.generate(prompts, sampling)
+            return [output.outputs[0].text for output in outputs]
+        
+        # 按固定批大小分批生成，限制单批的显存占用
+        results = []
+        for start in range(0, len(prompts), _GENERATE_BATCH_SIZE):
+            batch = prompts[start:start + _GENERATE_BATCH_SIZE]
+            inputs = self.tokenizer(
+                batch,
+                return_tensors="pt",
+                padding=True,
+                pad_to_multiple_of=_PROMPT_LENGTH_MULTIPLE if self._static_cache is not None else None
+            )
+            results.extend(self._generate_from_ids(inputs['input_ids'], inputs['attention_mask'], max_tokens))
+        return results
+    
+    def _generate_from_ids(self, input_ids: "torch.Tensor", attention_mask: "torch.Tensor",
+                           max_tokens: int) -> List[str]:
+        """基于已分词的输入批量生成文本，仅返回新生成的部分"""
+        rows, prompt_len = input_ids.shape
+        generate_kwargs = {}
+        compiled_forward = None
+        if self._static_cache is not None:
+            if prompt_len + max_tokens <= _STATIC_CACHE_LEN:
+                # 重复最后一行补齐到静态缓存的批大小，多余的输出丢弃
+                fill = _GENERATE_BATCH_SIZE - rows
+                if fill > 0:
+                    input_ids = self._torch.cat([input_ids, input_ids[-1:].expand(fill, -1)])
+                    attention_mask = self._torch.cat([attention_mask, attention_mask[-1:].expand(fill, -1)])
+                self._static_cache.reset()
+                generate_kwargs['past_key_values'] = self._static_cache
+            else:
+                # 超出静态缓存长度时本批改用eager模式和动态缓存
+                compiled_forward, self.model.forward = self.model.forward, self._eager_forward
+        
+        try:
             outputs = self.model.generate(
-                **inputs,
-                max_length=1000,
-                temperature=0.7,
-                num_return_sequences=1
+                input_ids=input_ids.to(self.model.device),
+                attention_mask=attention_mask.to(self.model.device),
+                max_new_tokens=max_tokens,
+                do_sample=False,
+                num_beams=1,
+                use_cache=True,
+                pad_token_id=self.tokenizer.eos_token_id,
+                **generate_kwargs
             )
-            prediction = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+        finally:
+            if compiled_forward is not None:
+                self.model.forward = compiled_forward
+        return self.tokenizer.batch_decode(outputs[:rows, prompt_len:], skip_special_tokens=True)
+    
+    def predict_vulnerabilities(self, scan_results: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """预测可能存在的漏洞"""
+        try:
+            # 构建提示并生成预测，vLLM通过前缀缓存复用提示中固定部分的KV缓存
+            prompt = self._build_vulnerability_prompt(scan_results)
+            prediction = self._generate([prompt], max_tokens=512)[0]
             
             # 解析预测结果
             vulnerabilities = self._parse_vulnerability_prediction(prediction)
@@ -56,29 +272,27 @@ class AIAnalyzer:
     
     def _build_vulnerability_prompt(self, scan_results: Dict[str, Any]) -> str:
         """构建漏洞预测提示"""
-        prompt = "基于以下扫描结果，分析可能存在的漏洞：\n\n"
+        return _VULN_PROMPT_PREFIX + self._format_scan_findings(scan_results) + _VULN_PROMPT_SUFFIX
+    
+    def _format_scan_findings(self, scan_results: Dict[str, Any]) -> str:
+        """格式化提示中的扫描结果部分"""
+        parts = []
         
         # 添加端口扫描信息
         if 'port_scan' in scan_results:
-            prompt += "开放端口和服务：\n"
+            parts.append("开放端口和服务：\n")
             for host, data in scan_results['port_scan'].items():
                 for proto in data.get('protocols', {}):
                     for port, info in data['protocols'][proto].items():
-                        prompt += f"- 端口 {port}/{proto}: {info['service']} {info.get('version', '')}\n"
+                        parts.append(f"- 端口 {port}/{proto}: {info['service']} {info.get('version', '')}\n")
         
         # 添加Web扫描结果
         if 'web_scan' in scan_results:
-            prompt += "\nWeb应用发现：\n"
+            parts.append("\nWeb应用发现：\n")
             for finding in scan_results['web_scan']:
-                prompt += f"- {finding}\n"
-        
-        prompt += "\n请分析上述信息，识别潜在的安全漏洞，包括：\n"
-        prompt += "1. 常见漏洞（如CVE）\n"
-        prompt += "2. 配置错误\n"
-        prompt += "3. 过时的软件版本\n"
-        prompt += "4. 不安全的服务\n"
+                parts.append(f"- {finding}\n")
         
-        return prompt
+        return "".join(parts)
     
     def _parse_vulnerability_prediction(self, prediction: str) -> List[Dict[str, Any]]:
         """解析模型预测结果"""
@@ -86,26 +300,27 @@ class AIAnalyzer:
         
         # 简单的文本分割处理
         for line in prediction.split('\n'):
-            if line.strip():
-                if 'CVE-' in line:
+            line = line.strip()
+            if line:
+                if _CVE_RE.search(line):
                     # CVE漏洞
                     vulnerabilities.append({
                         'type': 'cve',
-                        'description': line.strip(),
+                        'description': line,
                         'severity': self._estimate_severity(line)
                     })
-                elif any(keyword in line.lower() for keyword in ['配置', '错误', 'misconfiguration']):
+                elif _MISCONFIGURATION_RE.search(line):
                     # 配置问题
                     vulnerabilities.append({
                         'type': 'misconfiguration',
-                        'description': line.strip(),
+                        'description': line,
                         'severity': 'medium'
                     })
-                elif any(keyword in line.lower() for keyword in ['版本', 'version', 'outdated']):
+                elif _VERSION_RE.search(line):
                     # 版本问题
                     vulnerabilities.append({
                         'type': 'version',
-                        'description': line.strip(),
+                        'description': line,
                         'severity': 'low'
                     })
         
@@ -113,14 +328,10 @@ class AIAnalyzer:
     
     def _estimate_severity(self, text: str) -> str:
         """估计漏洞严重性"""
-        if any(keyword in text.lower() for keyword in ['严重', 'critical', 'rce', '远程代码']):
-            return 'critical'
-        elif any(keyword in text.lower() for keyword in ['高危', 'high']):
-            return 'high'
-        elif any(keyword in text.lower() for keyword in ['中危', 'medium']):
-            return 'medium'
-        else:
-            return 'low'
+        for severity, pattern in _SEVERITY_PATTERNS:
+            if pattern.search(text):
+                return severity
+        return 'low'
     
     def generate_recommendations(self, vulnerabilities: List[Dict[str, Any]]) -> Dict[str, List[str]]:
         """生成修复建议"""
@@ -132,20 +343,14 @@ class AIAnalyzer:
                 'low': []
             }
             
-            for vuln in vulnerabilities:
-                # 构建提示
-                prompt = f"为以下安全问题生成修复建议：\n{vuln['description']}\n\n建议："
-                
-                # 生成建议
-                inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
-                outputs = self.model.generate(
-                    **inputs,
-                    max_length=200,
-                    temperature=0.7,
-                    num_return_sequences=1
-                )
-                recommendation = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-                
+            # 一次性提交所有提示，由推理引擎批量处理
+            prompts = [
+                f"为以下安全问题生成修复建议：\n{vuln['description']}\n\n建议："
+                for vuln in vulnerabilities
+            ]
+            outputs = self._generate(prompts, max_tokens=150) if prompts else []
+            
+            for vuln, recommendation in zip(vulnerabilities, outputs):
                 # 添加到对应严重性级别
                 severity = vuln.get('severity', 'medium')
                 recommendations[severity].append({
@@ -162,31 +367,26 @@ class AIAnalyzer:
     def export_to_csv(self, filepath: str) -> None:
         """导出分析结果为CSV格式"""
         try:
-            # 创建数据框
-            data = []
+            # 按漏洞描述索引修复建议
+            rec_by_desc = {}
+            for recs in self.results.get('recommendations', {}).values():
+                for rec in recs:
+                    rec_by_desc[rec['vulnerability']] = rec['recommendation']
             
-            # 添加预测的漏洞
-            if 'predictions' in self.results:
-                for vuln in self.results['predictions']:
+            with open(filepath, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=['Type', 'Description', 'Severity', 'Recommendation'])
+                writer.writeheader()
+                
+                # 逐行写入预测的漏洞
+                for vuln in self.results.get('predictions', []):
                     row = {
                         'Type': vuln['type'],
                         'Description': vuln['description'],
                         'Severity': vuln['severity'],
-                        'Recommendation': ''
+                        'Recommendation': rec_by_desc.get(vuln['description'], '')
                     }
-                    
-                    # 查找对应的建议
-                    if 'recommendations' in self.results:
-                        for rec in self.results['recommendations'][vuln['severity']]:
-                            if rec['vulnerability'] == vuln['description']:
-                                row['Recommendation'] = rec['recommendation']
-                                break
-                    
-                    data.append(row)
+                    writer.writerow(row)
             
-            # 创建DataFrame并保存
-            df = pd.DataFrame(data)
-            df.to_csv(filepath, index=False, encoding='utf-8')
             console.print(f"[green]分析结果已保存到: {filepath}[/green]")
         except Exception as e:
             console.print(f"[red]导出CSV失败: {str(e)}[/red]")
@@ -194,8 +394,8 @@ class AIAnalyzer:
     def export_results(self, filepath: str) -> None:
         """导出完整结果为JSON格式"""
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.results, f, indent=4, ensure_ascii=False)
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(self.results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
             console.print(f"[green]AI分析结果已保存到: {filepath}[/green]")
         except Exception as e:
             console.print(f"[red]导出结果失败: {str(e)}[/red]") 
\ No newline at end of file
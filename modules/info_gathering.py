@@ -1,24 +1,48 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import asyncio
+import os
 import whois
 import dns.resolver
 import subprocess
 import json
+from concurrent.futures import ThreadPoolExecutor
 from rich.console import Console
-from typing import Dict, Any
+from typing import Dict, Any, List
+from diskcache import Cache
 
 console = Console()
 
+# 查询结果磁盘缓存
+_CACHE_DIR = os.path.expanduser("~/.autopen/cache")
+_WHOIS_TTL = 86400
+_DNS_TTL = 3600
+
 class InfoGathering:
-    def __init__(self, target: str):
+    def __init__(self, target: str, use_cache: bool = True):
         self.target = target
         self.results: Dict[str, Any] = {}
+        # 复用同一个解析器，避免每次查询重新读取 /etc/resolv.conf
+        self._resolver = dns.resolver.Resolver()
+        self._cache = None
+        if use_cache:
+            # 缓存目录不可写或被占用时不影响信息收集，直接查询
+            try:
+                self._cache = Cache(_CACHE_DIR)
+            except Exception as e:
+                console.print(f"[yellow]查询缓存不可用，将直接查询: {str(e)}[/yellow]")
     
     def gather_whois(self) -> Dict[str, Any]:
         """获取WHOIS信息"""
         try:
-            whois_info = whois.whois(self.target)
+            key = f"whois:{self.target}"
+            whois_info = self._cache.get(key) if self._cache is not None else None
+            if whois_info is None:
+                whois_info = dict(whois.whois(self.target))
+                if self._cache is not None:
+                    self._cache.set(key, whois_info, expire=_WHOIS_TTL)
+            
             self.results['whois'] = whois_info
             return whois_info
         except Exception as e:
@@ -34,32 +58,50 @@ class InfoGathering:
             'TXT': []
         }
         
-        for record_type in dns_info.keys():
-            try:
-                answers = dns.resolver.resolve(self.target, record_type)
-                dns_info[record_type] = [str(rdata) for rdata in answers]
-            except Exception as e:
-                console.print(f"[yellow]DNS {record_type}记录查询失败: {str(e)}[/yellow]")
+        # 并发查询各类型记录
+        with ThreadPoolExecutor(max_workers=len(dns_info)) as executor:
+            futures = {
+                record_type: executor.submit(self._resolve_records, record_type)
+                for record_type in dns_info
+            }
+            
+            for record_type, future in futures.items():
+                try:
+                    dns_info[record_type] = future.result()
+                except Exception as e:
+                    console.print(f"[yellow]DNS {record_type}记录查询失败: {str(e)}[/yellow]")
         
         self.results['dns'] = dns_info
         return dns_info
     
+    def _resolve_records(self, record_type: str) -> List[str]:
+        """查询单一类型的DNS记录，优先使用缓存"""
+        key = f"dns:{self.target}:{record_type}"
+        if self._cache is not None:
+            records = self._cache.get(key)
+            if records is not None:
+                return records
+        
+        records = [str(rdata) for rdata in self._resolver.resolve(self.target, record_type, lifetime=5)]
+        if self._cache is not None:
+            self._cache.set(key, records, expire=_DNS_TTL)
+        return records
+    
     def run_dnsrecon(self) -> Dict[str, Any]:
         """运行dnsrecon工具"""
         try:
-            cmd = f"dnsrecon -d {self.target} -t std"
-            process = subprocess.Popen(
-                cmd.split(),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
+            process = subprocess.run(
+                ['dnsrecon', '-d', self.target, '-t', 'std'],
+                capture_output=True,
+                timeout=120
             )
-            output, error = process.communicate()
             
             if process.returncode == 0:
-                self.results['dnsrecon'] = output.decode()
-                return {'output': output.decode()}
+                output = process.stdout.decode()
+                self.results['dnsrecon'] = output
+                return {'output': output}
             else:
-                console.print(f"[red]DNSRecon执行失败: {error.decode()}[/red]")
+                console.print(f"[red]DNSRecon执行失败: {process.stderr.decode()}[/red]")
                 return {}
         except Exception as e:
             console.print(f"[red]DNSRecon执行错误: {str(e)}[/red]")
@@ -69,8 +111,17 @@ class InfoGathering:
         """执行所有信息收集任务"""
         console.print("[bold blue]开始信息收集...[/bold blue]")
         
-        self.gather_whois()
-        self.gather_dns()
-        self.run_dnsrecon()
+        asyncio.run(self.gather_all_async())
+        
+        return self.results
+    
+    async def gather_all_async(self) -> Dict[str, Any]:
+        """并发执行所有信息收集任务"""
+        # 各任务均为阻塞的网络I/O，放入线程池并发执行
+        await asyncio.gather(
+            asyncio.to_thread(self.gather_whois),
+            asyncio.to_thread(self.gather_dns),
+            asyncio.to_thread(self.run_dnsrecon)
+        )
         
         return self.results 
\ No newline at end of file
@@ -1,20 +1,61 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import nmap
-import json
+import ipaddress
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import orjson
+from lxml import etree
 from rich.console import Console
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
 from retry import retry
 
 console = Console()
 
+# masscan发包速率(包/秒)
+_MASSCAN_RATE = 10000
+
+def _iter_nmap_hosts(source) -> Iterator[Tuple[str, str, Dict[str, Dict[int, Dict[str, str]]]]]:
+    """流式解析nmap XML输出，逐个返回 (主机, 状态, 协议端口表)"""
+    for _, host in etree.iterparse(source, events=('end',), tag='host'):
+        address = host.find("address[@addrtype='ipv4']")
+        if address is None:
+            address = host.find("address[@addrtype='ipv6']")
+        status = host.find('status')
+        
+        protocols: Dict[str, Dict[int, Dict[str, str]]] = {}
+        for port in host.iterfind('ports/port'):
+            state = port.find('state')
+            service = port.find('service')
+            service_attrs = service.attrib if service is not None else {}
+            protocols.setdefault(port.get('protocol'), {})[int(port.get('portid'))] = {
+                'state': state.get('state') if state is not None else '',
+                'service': service_attrs.get('name', ''),
+                'version': service_attrs.get('version', ''),
+                'product': service_attrs.get('product', '')
+            }
+        
+        if address is not None:
+            yield address.get('addr'), status.get('state') if status is not None else '', protocols
+        
+        # 释放已处理的节点，保持内存占用恒定
+        host.clear()
+        while host.getprevious() is not None:
+            del host.getparent()[0]
+
 class PortScanner:
-    def __init__(self, target: str, level: int = 1):
+    def __init__(self, target: str, level: int = 1, shards: int = 4):
         self.target = target
         self.level = level
-        self.nm = nmap.PortScanner()
+        self.shards = shards
         self.results: Dict[str, Any] = {}
+        # 开放端口索引，在合并扫描结果时同步维护
+        self._open_ports: Dict[str, list] = {}
+        self._lock = threading.Lock()
         
         # 根据扫描级别设置扫描参数
         self.scan_profiles = {
@@ -35,27 +76,25 @@ class PortScanner:
             scan_args = self.scan_profiles.get(self.level, self.scan_profiles[1])
             
             # 执行扫描
-            self.nm.scan(self.target, arguments=scan_args)
+            if '-p-' not in scan_args.split():
+                self._run_nmap(scan_args)
+                return self.results
             
-            # 解析结果
-            for host in self.nm.all_hosts():
-                self.results[host] = {
-                    'state': self.nm[host].state(),
-                    'protocols': {}
-                }
-                
-                for proto in self.nm[host].all_protocols():
-                    ports = self.nm[host][proto].keys()
-                    self.results[host]['protocols'][proto] = {}
-                    
-                    for port in ports:
-                        port_info = self.nm[host][proto][port]
-                        self.results[host]['protocols'][proto][port] = {
-                            'state': port_info['state'],
-                            'service': port_info.get('name', ''),
-                            'version': port_info.get('version', ''),
-                            'product': port_info.get('product', '')
-                        }
+            base_args = ' '.join(arg for arg in scan_args.split() if arg != '-p-')
+            open_ports = self._discover_open_ports()
+            
+            if open_ports:
+                # masscan已完成端口发现，nmap只识别开放端口上的服务
+                self._run_nmap(base_args, ports=','.join(map(str, sorted(open_ports))))
+            elif self.shards > 1:
+                # 全端口扫描按端口范围分片，多个nmap进程并发执行
+                with ThreadPoolExecutor(max_workers=self.shards) as executor:
+                    list(executor.map(
+                        lambda port_range: self._run_nmap(base_args, ports=f"{port_range[0]}-{port_range[1]}"),
+                        self._port_chunks()
+                    ))
+            else:
+                self._run_nmap(scan_args)
             
             return self.results
             
@@ -63,28 +102,111 @@ class PortScanner:
             console.print(f"[red]端口扫描失败: {str(e)}[/red]")
             raise
     
-    def get_open_ports(self) -> Dict[str, list]:
-        """获取开放端口列表"""
-        open_ports = {}
+    def _discover_open_ports(self) -> Optional[List[int]]:
+        """使用masscan快速发现开放端口，masscan不可用或未发现端口时返回None"""
+        if shutil.which('masscan') is None:
+            return None
         
-        for host in self.results:
-            open_ports[host] = []
-            for proto in self.results[host]['protocols']:
-                for port, info in self.results[host]['protocols'][proto].items():
-                    if info['state'] == 'open':
-                        open_ports[host].append({
+        try:
+            # masscan不解析域名
+            try:
+                ipaddress.ip_network(self.target, strict=False)
+                masscan_target = self.target
+            except ValueError:
+                masscan_target = socket.gethostbyname(self.target)
+            
+            console.print("[blue]正在使用masscan发现开放端口...[/blue]")
+            result = subprocess.run(
+                ['masscan', masscan_target, '-p1-65535', f'--rate={_MASSCAN_RATE}', '-oL', '-'],
+                capture_output=True
+            )
+            if result.returncode != 0:
+                console.print(f"[yellow]masscan执行失败，改用nmap全端口扫描: {result.stderr.decode()}[/yellow]")
+                return None
+            
+            # 输出格式: open tcp 80 1.2.3.4 1700000000
+            open_ports = set()
+            for line in result.stdout.decode().splitlines():
+                fields = line.split()
+                if len(fields) >= 3 and fields[0] == 'open' and fields[1] == 'tcp':
+                    open_ports.add(int(fields[2]))
+            if not open_ports:
+                # masscan单次发包且不重传，可能漏掉端口，由nmap全端口扫描兜底
+                console.print("[yellow]masscan未发现开放端口，改用nmap全端口扫描[/yellow]")
+                return None
+            return list(open_ports)
+        except Exception as e:
+            console.print(f"[yellow]masscan执行错误，改用nmap全端口扫描: {str(e)}[/yellow]")
+            return None
+    
+    def _port_chunks(self) -> List[Tuple[int, int]]:
+        """将1-65535端口均分为若干范围"""
+        return [
+            (i * 65535 // self.shards + 1, (i + 1) * 65535 // self.shards)
+            for i in range(self.shards)
+        ]
+    
+    def _run_nmap(self, arguments: str, ports: Optional[str] = None) -> None:
+        """运行nmap并流式合并XML输出"""
+        argv = ['nmap', '-oX', '-', *arguments.split()]
+        if ports:
+            argv += ['-p', ports]
+        argv.append(self.target)
+        
+        # stderr写入临时文件，解析stdout期间不会因stderr管道写满而阻塞
+        with tempfile.TemporaryFile() as error_file:
+            process = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=error_file)
+            parse_error = None
+            try:
+                for host, state, protocols in _iter_nmap_hosts(process.stdout):
+                    self._merge_host(host, state, protocols)
+            except etree.XMLSyntaxError as e:
+                # nmap执行失败时stdout为空或不完整，先确认进程退出状态
+                parse_error = e
+            finally:
+                process.stdout.close()
+                process.wait()
+            
+            if process.returncode != 0:
+                error_file.seek(0)
+                error = error_file.read().decode(errors='replace').strip()
+                raise RuntimeError(f"nmap执行失败: {error or parse_error}")
+        
+        if parse_error is not None:
+            raise RuntimeError(f"nmap输出解析失败: {parse_error}")
+    
+    def _merge_host(self, host: str, state: str, protocols: Dict[str, Dict[int, Dict[str, str]]]) -> None:
+        """合并单个主机的扫描结果"""
+        with self._lock:
+            host_result = self.results.setdefault(host, {
+                'state': state,
+                'protocols': {}
+            })
+            host_open_ports = self._open_ports.setdefault(host, [])
+            
+            for proto, ports in protocols.items():
+                proto_result = host_result['protocols'].setdefault(proto, {})
+                for port, port_info in ports.items():
+                    previous = proto_result.get(port)
+                    proto_result[port] = port_info
+                    
+                    # 重试扫描时同一端口可能被再次合并
+                    if port_info['state'] == 'open' and (previous is None or previous['state'] != 'open'):
+                        host_open_ports.append({
                             'port': port,
                             'protocol': proto,
-                            'service': info['service']
+                            'service': port_info['service']
                         })
-        
-        return open_ports
+    
+    def get_open_ports(self) -> Dict[str, list]:
+        """获取开放端口列表"""
+        return dict(self._open_ports)
     
     def export_json(self, filepath: str) -> None:
         """导出扫描结果为JSON格式"""
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.results, f, indent=4)
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(self.results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
             console.print(f"[green]扫描结果已保存到: {filepath}[/green]")
         except Exception as e:
-            console.print(f"[red]导出结果失败: {str(e)}[/red]") 
\ No newline at end of file
+            console.print(f"[red]导出结果失败: {str(e)}[/red]")
\ No newline at end of file
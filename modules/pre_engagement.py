@@ -5,7 +5,7 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import List, Dict, Any
 from rich.console import Console
-import json
+import orjson
 
 console = Console()
 
@@ -105,16 +105,17 @@ class PreEngagement:
                 'project_info': self.project_info,
                 'contacts': [vars(c) for c in self.contacts],
                 'scope': vars(self.scope),
+                # orjson原生支持datetime，输出ISO 8601格式
                 'timeframe': {
-                    'start_date': self.timeframe.start_date.isoformat(),
-                    'end_date': self.timeframe.end_date.isoformat(),
+                    'start_date': self.timeframe.start_date,
+                    'end_date': self.timeframe.end_date,
                     'blackout_periods': self.timeframe.blackout_periods
                 },
                 'legal_docs': self.legal_docs
             }
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(setup_data, f, indent=4, ensure_ascii=False)
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(setup_data, option=orjson.OPT_INDENT_2))
             
             console.print(f"[green]前期准备信息已保存到: {filepath}[/green]")
             
@@ -124,7 +125,7 @@ class PreEngagement:
     def generate_engagement_letter(self) -> str:
         """生成项目委托书"""
         try:
-            letter = f"""
+            parts = [f"""
 渗透测试项目委托书
 
 项目信息:
@@ -143,16 +144,16 @@ class PreEngagement:
 - 结束时间: {self.timeframe.end_date.strftime('%Y-%m-%d')}
 
 联系人信息:
-"""
+"""]
             for contact in self.contacts:
-                letter += f"""
+                parts.append(f"""
 - 姓名: {contact.name}
   角色: {contact.role}
   邮箱: {contact.email}
   电话: {contact.phone}
-"""
+""")
             
-            return letter
+            return "".join(parts)
             
         except Exception as e:
             console.print(f"[red]生成项目委托书失败: {str(e)}[/red]")
@@ -1,387 +1,557 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
+import io
+import logging
+import multiprocessing
+import orjson
+import os
+import statistics
+import sys
 from datetime import datetime
-from typing import Dict, Any, List
+from enum import Enum
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from functools import lru_cache
+from typing import Dict, Any, List, Iterator, TYPE_CHECKING
 from rich.console import Console
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-    PageBreak, Image, ListFlowable, ListItem
-)
+from jinja2 import Environment, DictLoader, FileSystemBytecodeCache
+from markupsafe import Markup
+
+# ReportLab与pypdf只在生成PDF时按需导入，仅生成HTML时不加载
+if TYPE_CHECKING:
+    from reportlab.platypus import Flowable, TableStyle
 
 console = Console()
+logger = logging.getLogger("autopentest.report")
+
+# 成功提示直接写入标准输出，不经过Rich标记解析
+_SUCCESS_PREFIX = '\x1b[32m'
+_RESET = '\x1b[0m'
+
+
+def _print_success(message: str) -> None:
+    """输出成功提示，仅在终端中添加颜色，重定向到文件或管道时保持纯文本"""
+    if sys.stdout.isatty():
+        message = f"{_SUCCESS_PREFIX}{message}{_RESET}"
+    sys.stdout.write(f"{message}\n")
+
+# 附录中不嵌入的扫描结果，凭据与哈希只保留在report.json中
+_APPENDIX_EXCLUDED_KEYS = frozenset({'post_exploit'})
+
+# PDF附录每行最大字符数，超长的原始输出自动折行
+_APPENDIX_LINE_LENGTH = 90
+
+# 扫描结果序列化后达到该大小才使用多进程排版PDF章节
+_PDF_PARALLEL_MIN_BYTES = 512 * 1024
+
+# HTML报告模板，模块加载时创建环境，编译结果在进程内及字节码缓存中复用
+_HTML_TEMPLATES = {
+    'report.html': """<!DOCTYPE html>
+<html>
+<head>
+    <title>渗透测试报告 - {{ target }}</title>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: Arial, sans-serif; margin: 40px; }
+        .header { background: #f5f5f5; padding: 20px; border-radius: 5px; }
+        .section { margin: 20px 0; }
+        .vulnerability {
+            border-left: 4px solid #ff4444;
+            padding: 10px;
+            margin: 10px 0;
+            background: #fff5f5;
+        }
+        .critical { color: #ff0000; }
+        .high { color: #ff4444; }
+        .medium { color: #ffa500; }
+        .low { color: #00aa00; }
+        .info { color: #666; }
+        table {
+            width: 100%;
+            border-collapse: collapse;
+            margin: 10px 0;
+        }
+        th, td {
+            border: 1px solid #ddd;
+            padding: 8px;
+            text-align: left;
+        }
+        th { background: #f5f5f5; }
+        .risk-matrix {
+            margin: 20px 0;
+            padding: 10px;
+            border: 1px solid #ddd;
+        }
+        .recommendations {
+            background: #f8f8f8;
+            padding: 15px;
+            border-radius: 5px;
+        }
+        pre { white-space: pre-wrap; word-break: break-all; }
+        /* 打印及转换PDF时每个章节单独成页 */
+        @page { size: letter; margin: 72pt; }
+        @media print {
+            .section { page-break-before: always; }
+        }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>渗透测试报告</h1>
+        <p><strong>目标:</strong> {{ target }}</p>
+        <p><strong>测试时间:</strong> {{ timestamp }}</p>
+    </div>
+    
+    <div class="section">
+        <h2>1. 执行摘要</h2>
+        {% include 'exec_summary.html' %}
+    </div>
+    
+    <div class="section">
+        <h2>2. 测试范围</h2>
+        {% include 'scope.html' %}
+    </div>
+    
+    <div class="section">
+        <h2>3. 风险评估</h2>
+        {% include 'risk_assessment.html' %}
+    </div>
+    
+    <div class="section">
+        <h2>4. 发现的漏洞</h2>
+        {% include 'vulns.html' %}
+    </div>
+    
+    <div class="section">
+        <h2>5. 攻击面分析</h2>
+        {% include 'attack_surface.html' %}
+    </div>
+    
+    <div class="section">
+        <h2>6. 修复建议</h2>
+        {% include 'recommendations.html' %}
+    </div>
+    
+    <div class="section">
+        <h2>7. 技术细节</h2>
+        {% include 'technical_details.html' %}
+    </div>
+    
+    {%- if scan_json is not none %}
+    
+    <div class="section">
+        <h2>8. 附录</h2>
+        <h3>原始扫描数据</h3>
+        <pre>{{ scan_json }}</pre>
+    </div>
+    {%- endif %}
+</body>
+</html>
+""",
+    'exec_summary.html': """<div class='executive-summary'>
+{%- if vuln_count is not none %}
+<h3>关键发现</h3>
+<ul>
+<li class='critical'>发现 {{ vuln_count['critical'] }} 个严重漏洞</li>
+<li class='high'>发现 {{ vuln_count['high'] }} 个高危漏洞</li>
+<li class='medium'>发现 {{ vuln_count['medium'] }} 个中危漏洞</li>
+<li class='low'>发现 {{ vuln_count['low'] }} 个低危漏洞</li>
+</ul>
+{%- endif %}
+{%- if risk_level is not none %}
+<h3>整体风险评估</h3>
+<p>目标系统的整体风险等级为 <span class='{{ risk_level|lower }}'>{{ risk_level }}</span></p>
+{%- endif %}
+</div>""",
+    'scope.html': """<div class='scope'>
+<h3>测试目标</h3>
+<p>目标系统: {{ target }}</p>
+{%- if 'port_scan' in results %}
+<h3>测试的服务</h3>
+<ul>
+{%- for label in service_labels %}
+<li>{{ label }}</li>
+{%- endfor %}
+</ul>
+{%- endif %}
+</div>""",
+    'risk_assessment.html': """<div class='risk-assessment'>
+{%- if 'threats' in results %}
+<div class='risk-matrix'>
+<h3>风险矩阵</h3>
+<table>
+<tr><th>威胁</th><th>可能性</th><th>影响</th><th>风险等级</th></tr>
+{{ risk_rows }}
+</table>
+</div>
+{%- endif %}
+</div>""",
+    'vulns.html': """<div class='vulnerabilities'>
+{%- for service_type, tool, findings, severity in vulns %}
+<div class='vulnerability'>
+    <h3 class='{{ severity }}'>{{ findings.get('name', '未命名漏洞') }}</h3>
+    <p><strong>影响服务:</strong> {{ service_type }}</p>
+    <p><strong>风险等级:</strong> <span class='{{ severity }}'>{{ severity|upper }}</span></p>
+    <p><strong>描述:</strong> {{ findings.get('description', '无描述') }}</p>
+    <p><strong>影响:</strong> {{ findings.get('impact', '未知') }}</p>
+    <p><strong>修复建议:</strong> {{ findings.get('recommendation', '无建议') }}</p>
+</div>
+{%- endfor %}
+</div>""",
+    'attack_surface.html': """<div class='attack-surface'>
+{%- if 'attack_surface' in results %}
+{%- set surface = results['attack_surface'] %}
+<h3>暴露的服务</h3>
+<ul>
+{%- for service in surface.get('exposed_services', []) %}
+<li>{{ service }}</li>
+{%- endfor %}
+</ul>
+<h3>可能的攻击向量</h3>
+<ul>
+{%- for vector in surface.get('attack_vectors', []) %}
+<li>{{ vector }}</li>
+{%- endfor %}
+</ul>
+{%- endif %}
+</div>""",
+    'recommendations.html': """<div class='recommendations'>
+{%- if 'recommendations' in results %}
+{%- for severity, items in results['recommendations'].items() %}
+<h3 class='{{ severity|lower }}'>{{ severity|upper }}级别建议</h3>
+<ul>
+{%- for item in items %}
+<li>{{ item['recommendation'] }}</li>
+{%- endfor %}
+</ul>
+{%- endfor %}
+{%- endif %}
+</div>""",
+    'technical_details.html': """<div class='technical-details'>
+{%- if 'port_scan' in results %}
+<h3>端口扫描详情</h3>
+<table>
+<tr><th>主机</th><th>端口</th><th>服务</th><th>版本</th></tr>
+{{ port_table_rows }}
+</table>
+{%- endif %}
+</div>"""
+}
+
+# 表格行格式，Markup的%格式化会对参数做HTML转义
+_RISK_ROW = Markup("<tr><td>%s</td><td>%s/10</td><td>%s/10</td><td class='%s'>%s</td></tr>")
+_PORT_ROW = Markup("<tr><td>%s</td><td>%s/%s</td><td>%s</td><td>%s</td></tr>")
+
+_env = Environment(
+    loader=DictLoader(_HTML_TEMPLATES),
+    autoescape=True,
+    auto_reload=False,
+    bytecode_cache=FileSystemBytecodeCache()
+)
+
+# HTML流式输出时每次拼接写入的模板片段数
+_HTML_CHUNK_PARTS = 256
+
+# HTML报告文件写缓冲区大小，合并写入系统调用
+_HTML_WRITE_BUFFER = 1 << 20
+
+# PDF排版时预读的流式对象数量，需覆盖keepWithNext等向后查看的范围
+_FEED_WINDOW = 64
+
+class _FlowableFeed(list):
+    """从生成器按需补充流式对象的列表，供doc.build逐个消费"""
+    
+    def __init__(self, flowables: Iterator['Flowable']):
+        super().__init__()
+        self._source = flowables
+        self._fill()
+    
+    def _fill(self) -> None:
+        while list.__len__(self) < _FEED_WINDOW:
+            flowable = next(self._source, None)
+            if flowable is None:
+                break
+            self.append(flowable)
+    
+    def __len__(self) -> int:
+        self._fill()
+        return list.__len__(self)
+    
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+    
+    def __delitem__(self, index) -> None:
+        list.__delitem__(self, index)
+        self._fill()
+
+def _json_default(obj: Any) -> Any:
+    """序列化orjson不支持的类型：集合转为排序后的列表，枚举取其值"""
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=str)
+    if isinstance(obj, Enum):
+        return obj.value
+    return str(obj)
+
+@lru_cache(maxsize=None)
+def _grid_style() -> 'TableStyle':
+    """报告中所有表格共用的网格样式，setStyle时命令会复制到表格中"""
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+    
+    return TableStyle([
+        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+        ('GRID', (0,0), (-1,-1), 1, colors.black),
+        ('BACKGROUND', (0,0), (-1,0), colors.grey)
+    ])
 
 class ReportGenerator:
-    def __init__(self, target: str, scan_results: Dict[str, Any]):
+    # 样式表与报告内容无关，所有实例共用
+    _STYLES = None
+    
+    def __init__(self, target: str, scan_results: Dict[str, Any], include_appendix: bool = False):
         self.target = target
         self.scan_results = scan_results
-        self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.styles = getSampleStyleSheet()
-        
-        # 创建自定义样式
-        self.styles.add(ParagraphStyle(
-            'VulnTitle',
-            parent=self.styles['Heading2'],
-            textColor=colors.red,
-            spaceAfter=12
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            'RiskHigh',
-            parent=self.styles['Normal'],
-            textColor=colors.red,
-            fontSize=12
+        # 是否在HTML/PDF报告中附带原始扫描数据
+        self.include_appendix = include_appendix
+        self.timestamp = datetime.now().isoformat(sep=' ', timespec='seconds')
+        self._html = None
+        self._scan_json = None
+        self._appendix_text = None
+        
+        # 漏洞统计与已确认漏洞列表只计算一次，HTML和PDF报告共用
+        # 每项为 (服务类型, 工具, 漏洞详情, 小写风险等级)
+        # 扫描结果中夹杂非字典取值(如SMB检测的vulnerable/details字段、Nikto原始JSON)，跳过
+        self._flat_vulns = list(chain.from_iterable(
+            (
+                (service_type, tool, findings, str(findings.get('severity', 'medium')).casefold())
+                for tool, findings in results.items()
+                if isinstance(findings, dict) and findings.get('vulnerable', False)
+            )
+            for service_type, results in scan_results.get('vuln_scan', {}).items()
+            if isinstance(results, dict)
         ))
+        self._vuln_count = Counter(severity for _, _, _, severity in self._flat_vulns)
         
-        self.styles.add(ParagraphStyle(
-            'RiskMedium',
-            parent=self.styles['Normal'],
-            textColor=colors.orange,
-            fontSize=12
-        ))
+        # 威胁行 (名称, 可能性, 影响, 风险等级, 小写风险等级)
+        self._threat_rows = [
+            (threat['name'], threat['likelihood'], threat['impact'], threat['level'], threat['level'].casefold())
+            for threat in scan_results.get('threats', [])
+        ]
         
-        self.styles.add(ParagraphStyle(
-            'RiskLow',
-            parent=self.styles['Normal'],
-            textColor=colors.green,
-            fontSize=12
+        # 端口扫描结果展开为 (主机, 端口, 协议, 服务, 版本) 行
+        self._port_rows = list(chain.from_iterable(
+            (
+                (host, port, proto, info['service'], info.get('version', 'unknown'))
+                for port, info in ports.items()
+            )
+            for host, data in scan_results.get('port_scan', {}).items()
+            for proto, ports in data.get('protocols', {}).items()
         ))
+        self._service_labels = [f"{service} ({port}/{proto})" for _, port, proto, service, _ in self._port_rows]
+    
+    @property
+    def styles(self):
+        """PDF排版使用的样式表"""
+        return self._get_styles()
+    
+    @classmethod
+    def _get_styles(cls):
+        """获取共用样式表，首次调用时创建"""
+        if cls._STYLES is None:
+            from reportlab.lib import colors
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            
+            styles = getSampleStyleSheet()
+            
+            # 创建自定义样式
+            styles.add(ParagraphStyle(
+                'VulnTitle',
+                parent=styles['Heading2'],
+                textColor=colors.red,
+                spaceAfter=12
+            ))
+            
+            styles.add(ParagraphStyle(
+                'RiskHigh',
+                parent=styles['Normal'],
+                textColor=colors.red,
+                fontSize=12
+            ))
+            
+            styles.add(ParagraphStyle(
+                'RiskMedium',
+                parent=styles['Normal'],
+                textColor=colors.orange,
+                fontSize=12
+            ))
+            
+            styles.add(ParagraphStyle(
+                'RiskLow',
+                parent=styles['Normal'],
+                textColor=colors.green,
+                fontSize=12
+            ))
+            
+            cls._STYLES = styles
+        return cls._STYLES
     
     def generate_html(self, output_path: str) -> None:
         """生成HTML格式报告"""
         try:
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>渗透测试报告 - {self.target}</title>
-                <meta charset="utf-8">
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 40px; }}
-                    .header {{ background: #f5f5f5; padding: 20px; border-radius: 5px; }}
-                    .section {{ margin: 20px 0; }}
-                    .vulnerability {{ 
-                        border-left: 4px solid #ff4444;
-                        padding: 10px;
-                        margin: 10px 0;
-                        background: #fff5f5;
-                    }}
-                    .critical {{ color: #ff0000; }}
-                    .high {{ color: #ff4444; }}
-                    .medium {{ color: #ffa500; }}
-                    .low {{ color: #00aa00; }}
-                    .info {{ color: #666; }}
-                    table {{ 
-                        width: 100%;
-                        border-collapse: collapse;
-                        margin: 10px 0;
-                    }}
-                    th, td {{
-                        border: 1px solid #ddd;
-                        padding: 8px;
-                        text-align: left;
-                    }}
-                    th {{ background: #f5f5f5; }}
-                    .risk-matrix {{
-                        margin: 20px 0;
-                        padding: 10px;
-                        border: 1px solid #ddd;
-                    }}
-                    .recommendations {{
-                        background: #f8f8f8;
-                        padding: 15px;
-                        border-radius: 5px;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="header">
-                    <h1>渗透测试报告</h1>
-                    <p><strong>目标:</strong> {self.target}</p>
-                    <p><strong>测试时间:</strong> {self.timestamp}</p>
-                </div>
-                
-                <div class="section">
-                    <h2>1. 执行摘要</h2>
-                    {self._format_executive_summary_html()}
-                </div>
-                
-                <div class="section">
-                    <h2>2. 测试范围</h2>
-                    {self._format_scope_html()}
-                </div>
-                
-                <div class="section">
-                    <h2>3. 风险评估</h2>
-                    {self._format_risk_assessment_html()}
-                </div>
-                
-                <div class="section">
-                    <h2>4. 发现的漏洞</h2>
-                    {self._format_vulnerabilities_html()}
-                </div>
-                
-                <div class="section">
-                    <h2>5. 攻击面分析</h2>
-                    {self._format_attack_surface_html()}
-                </div>
-                
-                <div class="section">
-                    <h2>6. 修复建议</h2>
-                    {self._format_recommendations_html()}
-                </div>
-                
-                <div class="section">
-                    <h2>7. 技术细节</h2>
-                    {self._format_technical_details_html()}
-                </div>
-            </body>
-            </html>
-            """
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
-            console.print(f"[green]HTML报告已生成: {output_path}[/green]")
-        except Exception as e:
-            console.print(f"[red]HTML报告生成失败: {str(e)}[/red]")
+            template = _env.get_template('report.html')
+            stream = template.stream(self._html_context())
+            # 模板输出的小片段先按块用join拼接，再整块写入文件
+            stream.enable_buffering(_HTML_CHUNK_PARTS)
+        except Exception:
+            logger.exception("HTML报告渲染失败: %s", output_path)
+            return
+        
+        # 模板流式渲染直接写入文件，出错时已写入的部分仍保留在文件中
+        try:
+            # 以二进制方式写入，每个拼接块只编码一次，绕过TextIOWrapper的逐次编码
+            with open(output_path, 'wb', buffering=_HTML_WRITE_BUFFER) as f:
+                stream.dump(f, encoding='utf-8')
+        except Exception:
+            logger.exception("HTML报告生成中断，已写入部分内容: %s", output_path)
+            return
+        
+        _print_success(f"HTML报告已生成: {output_path}")
     
     def generate_pdf(self, output_path: str) -> None:
         """生成PDF格式报告"""
         try:
-            doc = SimpleDocTemplate(
-                output_path,
-                pagesize=letter,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=72
-            )
-            
-            story = []
-            
-            # 封面
-            self._add_cover_page(story)
-            
-            # 目录
-            self._add_table_of_contents(story)
-            
-            # 执行摘要
-            self._add_executive_summary(story)
-            
-            # 测试范围
-            self._add_scope(story)
-            
-            # 风险评估
-            self._add_risk_assessment(story)
-            
-            # 漏洞发现
-            self._add_vulnerabilities(story)
-            
-            # 攻击面分析
-            self._add_attack_surface(story)
-            
-            # 修复建议
-            self._add_recommendations(story)
-            
-            # 技术细节
-            self._add_technical_details(story)
-            
-            # 附录
-            self._add_appendices(story)
-            
-            doc.build(story)
-            console.print(f"[green]PDF报告已生成: {output_path}[/green]")
-        except Exception as e:
-            console.print(f"[red]PDF报告生成失败: {str(e)}[/red]")
-    
-    def _format_executive_summary_html(self) -> str:
-        """格式化执行摘要为HTML"""
-        summary = "<div class='executive-summary'>"
-        
-        # 关键发现
-        if 'vuln_scan' in self.scan_results:
-            vuln_count = {
-                'critical': 0,
-                'high': 0,
-                'medium': 0,
-                'low': 0
-            }
-            
-            for service_type, results in self.scan_results['vuln_scan'].items():
-                if isinstance(results, dict):
-                    for tool, findings in results.items():
-                        if findings.get('vulnerable', False):
-                            severity = findings.get('severity', 'medium').lower()
-                            vuln_count[severity] += 1
-            
-            summary += "<h3>关键发现</h3>"
-            summary += "<ul>"
-            summary += f"<li class='critical'>发现 {vuln_count['critical']} 个严重漏洞</li>"
-            summary += f"<li class='high'>发现 {vuln_count['high']} 个高危漏洞</li>"
-            summary += f"<li class='medium'>发现 {vuln_count['medium']} 个中危漏洞</li>"
-            summary += f"<li class='low'>发现 {vuln_count['low']} 个低危漏洞</li>"
-            summary += "</ul>"
-        
-        # 整体风险评估
-        if 'risk_scores' in self.scan_results:
-            total_score = sum(self.scan_results['risk_scores'].values()) / len(self.scan_results['risk_scores'])
-            risk_level = "高危" if total_score >= 75 else "中危" if total_score >= 50 else "低危"
-            summary += f"<h3>整体风险评估</h3>"
-            summary += f"<p>目标系统的整体风险等级为 <span class='{risk_level.lower()}'>{risk_level}</span></p>"
+            from weasyprint import HTML
+        except (ImportError, OSError):
+            # WeasyPrint依赖系统Pango库，不可用时使用ReportLab排版
+            console.print("[yellow]WeasyPrint不可用，使用ReportLab生成PDF[/yellow]")
+            try:
+                self._generate_pdf_reportlab(output_path)
+            except Exception:
+                logger.exception("PDF报告生成失败: %s", output_path)
+            return
+        
+        # 直接将HTML报告转换为PDF，章节内容只生成一次
+        try:
+            HTML(string=self._render_html_once()).write_pdf(output_path, optimize_images=True)
+        except Exception:
+            logger.exception("PDF报告写入失败: %s", output_path)
+            return
         
-        summary += "</div>"
-        return summary
+        _print_success(f"PDF报告已生成: {output_path}")
     
-    def _format_scope_html(self) -> str:
-        """格式化测试范围为HTML"""
-        scope = "<div class='scope'>"
-        
-        # 目标信息
-        scope += "<h3>测试目标</h3>"
-        scope += f"<p>目标系统: {self.target}</p>"
-        
-        # 测试的服务
-        if 'port_scan' in self.scan_results:
-            scope += "<h3>测试的服务</h3>"
-            scope += "<ul>"
-            for host, data in self.scan_results['port_scan'].items():
-                for proto in data.get('protocols', {}):
-                    for port, info in data['protocols'][proto].items():
-                        scope += f"<li>{info['service']} ({port}/{proto})</li>"
-            scope += "</ul>"
-        
-        scope += "</div>"
-        return scope
-    
-    def _format_risk_assessment_html(self) -> str:
-        """格式化风险评估为HTML"""
-        risk = "<div class='risk-assessment'>"
-        
-        # 风险矩阵
-        if 'threats' in self.scan_results:
-            risk += "<div class='risk-matrix'>"
-            risk += "<h3>风险矩阵</h3>"
-            risk += "<table>"
-            risk += "<tr><th>威胁</th><th>可能性</th><th>影响</th><th>风险等级</th></tr>"
-            
-            for threat in self.scan_results['threats']:
-                likelihood = threat['likelihood']
-                impact = threat['impact']
-                level = threat['level']
+    def _generate_pdf_reportlab(self, output_path: str) -> None:
+        """使用ReportLab生成PDF格式报告"""
+        from pypdf import PdfWriter
+        
+        writer = PdfWriter()
+        
+        # 扫描结果较小时进程启动开销超过排版耗时，直接在当前进程中逐章排版
+        if len(self._render_scan_json()) < _PDF_PARALLEL_MIN_BYTES:
+            for chapter in _PDF_CHAPTERS:
+                # 单个章节失败时跳过该章节，其余章节照常输出
+                try:
+                    writer.append(io.BytesIO(_build_chapter_pdf(self, chapter)))
+                except Exception:
+                    logger.exception("PDF章节生成失败，已跳过: %s", chapter)
+        else:
+            # 各章节相互独立，分别在子进程中排版后按顺序合并
+            # 当前进程可能已加载torch/CUDA并持有后台线程，不使用fork，扫描结果由initializer传入
+            context = multiprocessing.get_context('forkserver' if sys.platform.startswith('linux') else 'spawn')
+            with ProcessPoolExecutor(
+                max_workers=min(len(_PDF_CHAPTERS), os.cpu_count() or 1),
+                mp_context=context,
+                initializer=_init_chapter_worker,
+                initargs=(self.target, self.scan_results, self.timestamp, self.include_appendix)
+            ) as executor:
+                futures = [(chapter, executor.submit(_render_chapter, chapter)) for chapter in _PDF_CHAPTERS]
                 
-                risk += f"""
-                <tr>
-                    <td>{threat['name']}</td>
-                    <td>{likelihood}/10</td>
-                    <td>{impact}/10</td>
-                    <td class='{level.lower()}'>{level}</td>
-                </tr>
-                """
-            
-            risk += "</table>"
-            risk += "</div>"
-        
-        risk += "</div>"
-        return risk
-    
-    def _format_vulnerabilities_html(self) -> str:
-        """格式化漏洞发现为HTML"""
-        vulns = "<div class='vulnerabilities'>"
+                for chapter, future in futures:
+                    try:
+                        writer.append(io.BytesIO(future.result()))
+                    except Exception:
+                        logger.exception("PDF章节生成失败，已跳过: %s", chapter)
         
-        if 'vuln_scan' in self.scan_results:
-            for service_type, results in self.scan_results['vuln_scan'].items():
-                if isinstance(results, dict):
-                    for tool, findings in results.items():
-                        if findings.get('vulnerable', False):
-                            severity = findings.get('severity', 'medium').lower()
-                            vulns += f"""
-                            <div class='vulnerability'>
-                                <h3 class='{severity}'>{findings.get('name', '未命名漏洞')}</h3>
-                                <p><strong>影响服务:</strong> {service_type}</p>
-                                <p><strong>风险等级:</strong> <span class='{severity}'>{severity.upper()}</span></p>
-                                <p><strong>描述:</strong> {findings.get('description', '无描述')}</p>
-                                <p><strong>影响:</strong> {findings.get('impact', '未知')}</p>
-                                <p><strong>修复建议:</strong> {findings.get('recommendation', '无建议')}</p>
-                            </div>
-                            """
-        
-        vulns += "</div>"
-        return vulns
-    
-    def _format_attack_surface_html(self) -> str:
-        """格式化攻击面分析为HTML"""
-        attack = "<div class='attack-surface'>"
-        
-        if 'attack_surface' in self.scan_results:
-            surface = self.scan_results['attack_surface']
-            
-            # 暴露的服务
-            attack += "<h3>暴露的服务</h3>"
-            attack += "<ul>"
-            for service in surface.get('exposed_services', []):
-                attack += f"<li>{service}</li>"
-            attack += "</ul>"
-            
-            # 攻击向量
-            attack += "<h3>可能的攻击向量</h3>"
-            attack += "<ul>"
-            for vector in surface.get('attack_vectors', []):
-                attack += f"<li>{vector}</li>"
-            attack += "</ul>"
+        try:
+            writer.write(output_path)
+        except Exception:
+            logger.exception("PDF报告写入失败: %s", output_path)
+            return
         
-        attack += "</div>"
-        return attack
+        _print_success(f"PDF报告已生成: {output_path}")
     
-    def _format_recommendations_html(self) -> str:
-        """格式化修复建议为HTML"""
-        recs = "<div class='recommendations'>"
-        
-        if 'recommendations' in self.scan_results:
-            for severity, items in self.scan_results['recommendations'].items():
-                recs += f"<h3 class='{severity.lower()}'>{severity.upper()}级别建议</h3>"
-                recs += "<ul>"
-                for item in items:
-                    recs += f"<li>{item['recommendation']}</li>"
-                recs += "</ul>"
+    def generate_json(self, output_path: str) -> None:
+        """生成JSON格式的原始扫描数据"""
+        try:
+            with open(output_path, 'wb') as f:
+                f.write(self._render_scan_json())
+        except Exception:
+            logger.exception("JSON报告写入失败: %s", output_path)
+            return
         
-        recs += "</div>"
-        return recs
+        _print_success(f"JSON报告已生成: {output_path}")
     
-    def _format_technical_details_html(self) -> str:
-        """格式化技术细节为HTML"""
-        tech = "<div class='technical-details'>"
+    def _render_scan_json(self) -> bytes:
+        """序列化完整的原始扫描数据，用于JSON导出，结果在实例内缓存"""
+        if self._scan_json is None:
+            self._scan_json = orjson.dumps(
+                self.scan_results,
+                default=_json_default,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            )
+        return self._scan_json
+    
+    def _render_appendix_text(self) -> str:
+        """报告附录中的原始扫描数据，排除后渗透阶段的敏感结果"""
+        if self._appendix_text is None:
+            self._appendix_text = orjson.dumps(
+                {key: value for key, value in self.scan_results.items() if key not in _APPENDIX_EXCLUDED_KEYS},
+                default=_json_default,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            ).decode('utf-8')
+        return self._appendix_text
+    
+    def _render_html_once(self) -> str:
+        """渲染完整HTML报告，结果在实例内缓存"""
+        if self._html is None:
+            self._html = _env.get_template('report.html').render(self._html_context())
+        return self._html
+    
+    def _html_context(self) -> Dict[str, Any]:
+        """构建HTML报告模板上下文"""
+        context = {
+            'target': self.target,
+            'timestamp': self.timestamp,
+            'results': self.scan_results,
+            'vuln_count': self._vuln_count if 'vuln_scan' in self.scan_results else None,
+            'vulns': self._flat_vulns,
+            'service_labels': self._service_labels,
+            'risk_rows': Markup('\n').join(
+                _RISK_ROW % (name, likelihood, impact, level_lower, level)
+                for name, likelihood, impact, level, level_lower in self._threat_rows
+            ),
+            'port_table_rows': Markup('\n').join(
+                _PORT_ROW % row for row in self._port_rows
+            ),
+            'scan_json': self._render_appendix_text() if self.include_appendix else None,
+            'risk_level': None
+        }
         
-        # 端口扫描结果
-        if 'port_scan' in self.scan_results:
-            tech += "<h3>端口扫描详情</h3>"
-            tech += "<table>"
-            tech += "<tr><th>主机</th><th>端口</th><th>服务</th><th>版本</th></tr>"
-            
-            for host, data in self.scan_results['port_scan'].items():
-                for proto in data.get('protocols', {}):
-                    for port, info in data['protocols'][proto].items():
-                        tech += f"""
-                        <tr>
-                            <td>{host}</td>
-                            <td>{port}/{proto}</td>
-                            <td>{info['service']}</td>
-                            <td>{info.get('version', 'unknown')}</td>
-                        </tr>
-                        """
-            
-            tech += "</table>"
+        # 整体风险评估
+        scores = self.scan_results.get('risk_scores')
+        if scores:
+            total_score = statistics.fmean(scores.values())
+            context['risk_level'] = "高危" if total_score >= 75 else "中危" if total_score >= 50 else "低危"
         
-        tech += "</div>"
-        return tech
+        return context
     
-    def _add_cover_page(self, story: list) -> None:
+    def _add_cover_page(self) -> Iterator['Flowable']:
         """添加封面"""
+        from reportlab.lib.styles import ParagraphStyle
+        from reportlab.platypus import Paragraph, Spacer, PageBreak
+        
         # 标题
         title_style = ParagraphStyle(
             'CustomTitle',
@@ -390,18 +560,20 @@ class ReportGenerator:
             spaceAfter=30,
             alignment=1  # 居中
         )
-        story.append(Paragraph("渗透测试报告", title_style))
-        story.append(Spacer(1, 60))
+        yield Paragraph("渗透测试报告", title_style)
+        yield Spacer(1, 60)
         
         # 目标信息
-        story.append(Paragraph(f"测试目标: {self.target}", self.styles['Normal']))
-        story.append(Paragraph(f"报告时间: {self.timestamp}", self.styles['Normal']))
-        story.append(PageBreak())
+        yield Paragraph(f"测试目标: {self.target}", self.styles['Normal'])
+        yield Paragraph(f"报告时间: {self.timestamp}", self.styles['Normal'])
+        yield PageBreak()
     
-    def _add_table_of_contents(self, story: list) -> None:
+    def _add_table_of_contents(self) -> Iterator['Flowable']:
         """添加目录"""
-        story.append(Paragraph("目录", self.styles['Heading1']))
-        story.append(Spacer(1, 12))
+        from reportlab.platypus import Paragraph, Spacer, PageBreak
+        
+        yield Paragraph("目录", self.styles['Heading1'])
+        yield Spacer(1, 12)
         
         toc_items = [
             "1. 执行摘要",
@@ -415,34 +587,25 @@ class ReportGenerator:
         ]
         
         for item in toc_items:
-            story.append(Paragraph(item, self.styles['Normal']))
-            story.append(Spacer(1, 6))
+            yield Paragraph(item, self.styles['Normal'])
+            yield Spacer(1, 6)
         
-        story.append(PageBreak())
+        yield PageBreak()
     
-    def _add_executive_summary(self, story: list) -> None:
+    def _add_executive_summary(self) -> Iterator['Flowable']:
         """添加执行摘要"""
-        story.append(Paragraph("1. 执行摘要", self.styles['Heading1']))
-        story.append(Spacer(1, 12))
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Paragraph, Spacer, Table, PageBreak
+        
+        yield Paragraph("1. 执行摘要", self.styles['Heading1'])
+        yield Spacer(1, 12)
         
         # 添加关键发现统计
         if 'vuln_scan' in self.scan_results:
-            vuln_count = {
-                'critical': 0,
-                'high': 0,
-                'medium': 0,
-                'low': 0
-            }
-            
-            for service_type, results in self.scan_results['vuln_scan'].items():
-                if isinstance(results, dict):
-                    for tool, findings in results.items():
-                        if findings.get('vulnerable', False):
-                            severity = findings.get('severity', 'medium').lower()
-                            vuln_count[severity] += 1
+            vuln_count = self._vuln_count
             
-            story.append(Paragraph("关键发现", self.styles['Heading2']))
-            story.append(Spacer(1, 6))
+            yield Paragraph("关键发现", self.styles['Heading2'])
+            yield Spacer(1, 6)
             
             findings = [
                 [Paragraph("风险等级", self.styles['Heading2']), Paragraph("数量", self.styles['Heading2'])],
@@ -453,185 +616,167 @@ class ReportGenerator:
             ]
             
             t = Table(findings, colWidths=[2*inch, inch])
-            t.setStyle(TableStyle([
-                ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-                ('GRID', (0,0), (-1,-1), 1, colors.black),
-                ('BACKGROUND', (0,0), (-1,0), colors.grey)
-            ]))
-            story.append(t)
+            t.setStyle(_grid_style())
+            yield t
         
-        story.append(PageBreak())
+        yield PageBreak()
     
-    def _add_scope(self, story: list) -> None:
+    def _add_scope(self) -> Iterator['Flowable']:
         """添加测试范围"""
-        story.append(Paragraph("2. 测试范围", self.styles['Heading1']))
-        story.append(Spacer(1, 12))
+        from reportlab.platypus import Paragraph, Spacer, PageBreak
+        
+        yield Paragraph("2. 测试范围", self.styles['Heading1'])
+        yield Spacer(1, 12)
         
         # 目标信息
-        story.append(Paragraph("测试目标", self.styles['Heading2']))
-        story.append(Paragraph(f"目标系统: {self.target}", self.styles['Normal']))
-        story.append(Spacer(1, 12))
+        yield Paragraph("测试目标", self.styles['Heading2'])
+        yield Paragraph(f"目标系统: {self.target}", self.styles['Normal'])
+        yield Spacer(1, 12)
         
         # 测试的服务
         if 'port_scan' in self.scan_results:
-            story.append(Paragraph("测试的服务", self.styles['Heading2']))
-            services = []
-            for host, data in self.scan_results['port_scan'].items():
-                for proto in data.get('protocols', {}):
-                    for port, info in data['protocols'][proto].items():
-                        services.append(
-                            Paragraph(f"• {info['service']} ({port}/{proto})", self.styles['Normal'])
-                        )
-            
-            for service in services:
-                story.append(service)
+            yield Paragraph("测试的服务", self.styles['Heading2'])
+            normal = self.styles['Normal']
+            for label in self._service_labels:
+                yield Paragraph(f"• {label}", normal)
         
-        story.append(PageBreak())
+        yield PageBreak()
     
-    def _add_risk_assessment(self, story: list) -> None:
+    def _add_risk_assessment(self) -> Iterator['Flowable']:
         """添加风险评估"""
-        story.append(Paragraph("3. 风险评估", self.styles['Heading1']))
-        story.append(Spacer(1, 12))
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Paragraph, Spacer, Table, PageBreak
+        
+        yield Paragraph("3. 风险评估", self.styles['Heading1'])
+        yield Spacer(1, 12)
         
         if 'threats' in self.scan_results:
             # 风险矩阵
-            story.append(Paragraph("风险矩阵", self.styles['Heading2']))
-            story.append(Spacer(1, 6))
+            yield Paragraph("风险矩阵", self.styles['Heading2'])
+            yield Spacer(1, 6)
             
             matrix_data = [['威胁', '可能性', '影响', '风险等级']]
-            for threat in self.scan_results['threats']:
-                matrix_data.append([
-                    threat['name'],
-                    f"{threat['likelihood']}/10",
-                    f"{threat['impact']}/10",
-                    threat['level']
-                ])
+            for name, likelihood, impact, level, _ in self._threat_rows:
+                matrix_data.append([name, f"{likelihood}/10", f"{impact}/10", level])
             
             t = Table(matrix_data, colWidths=[2.5*inch, inch, inch, 1.5*inch])
-            t.setStyle(TableStyle([
-                ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-                ('GRID', (0,0), (-1,-1), 1, colors.black),
-                ('BACKGROUND', (0,0), (-1,0), colors.grey)
-            ]))
-            story.append(t)
+            t.setStyle(_grid_style())
+            yield t
         
-        story.append(PageBreak())
+        yield PageBreak()
     
-    def _add_vulnerabilities(self, story: list) -> None:
+    def _add_vulnerabilities(self) -> Iterator['Flowable']:
         """添加漏洞发现"""
-        story.append(Paragraph("4. 发现的漏洞", self.styles['Heading1']))
-        story.append(Spacer(1, 12))
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Paragraph, Spacer, Table, PageBreak
+        
+        yield Paragraph("4. 发现的漏洞", self.styles['Heading1'])
+        yield Spacer(1, 12)
+        
+        # 循环内使用的样式与列宽提前取出
+        vuln_style = self.styles['VulnTitle']
+        col_widths = [1.5*inch, 4.5*inch]
+        
+        for service_type, tool, findings, _ in self._flat_vulns:
+            # 漏洞标题
+            yield Paragraph(findings.get('name', '未命名漏洞'), vuln_style)
+            
+            # 漏洞详情
+            details = [
+                ['属性', '描述'],
+                ['影响服务', service_type],
+                ['风险等级', findings.get('severity', 'MEDIUM')],
+                ['描述', findings.get('description', '无描述')],
+                ['影响', findings.get('impact', '未知')],
+                ['修复建议', findings.get('recommendation', '无建议')]
+            ]
+            
+            t = Table(details, colWidths=col_widths)
+            t.setStyle(_grid_style())
+            yield t
+            yield Spacer(1, 12)
         
-        if 'vuln_scan' in self.scan_results:
-            for service_type, results in self.scan_results['vuln_scan'].items():
-                if isinstance(results, dict):
-                    for tool, findings in results.items():
-                        if findings.get('vulnerable', False):
-                            # 漏洞标题
-                            story.append(Paragraph(
-                                findings.get('name', '未命名漏洞'),
-                                self.styles['VulnTitle']
-                            ))
-                            
-                            # 漏洞详情
-                            details = [
-                                ['属性', '描述'],
-                                ['影响服务', service_type],
-                                ['风险等级', findings.get('severity', 'MEDIUM')],
-                                ['描述', findings.get('description', '无描述')],
-                                ['影响', findings.get('impact', '未知')],
-                                ['修复建议', findings.get('recommendation', '无建议')]
-                            ]
-                            
-                            t = Table(details, colWidths=[1.5*inch, 4.5*inch])
-                            t.setStyle(TableStyle([
-                                ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-                                ('GRID', (0,0), (-1,-1), 1, colors.black),
-                                ('BACKGROUND', (0,0), (-1,0), colors.grey)
-                            ]))
-                            story.append(t)
-                            story.append(Spacer(1, 12))
-        
-        story.append(PageBreak())
-    
-    def _add_attack_surface(self, story: list) -> None:
+        yield PageBreak()
+    
+    def _add_attack_surface(self) -> Iterator['Flowable']:
         """添加攻击面分析"""
-        story.append(Paragraph("5. 攻击面分析", self.styles['Heading1']))
-        story.append(Spacer(1, 12))
+        from reportlab.platypus import Paragraph, Spacer, PageBreak
+        
+        yield Paragraph("5. 攻击面分析", self.styles['Heading1'])
+        yield Spacer(1, 12)
         
         if 'attack_surface' in self.scan_results:
             surface = self.scan_results['attack_surface']
             
             # 暴露的服务
-            story.append(Paragraph("暴露的服务", self.styles['Heading2']))
+            yield Paragraph("暴露的服务", self.styles['Heading2'])
             for service in surface.get('exposed_services', []):
-                story.append(Paragraph(f"• {service}", self.styles['Normal']))
-            story.append(Spacer(1, 12))
+                yield Paragraph(f"• {service}", self.styles['Normal'])
+            yield Spacer(1, 12)
             
             # 攻击向量
-            story.append(Paragraph("可能的攻击向量", self.styles['Heading2']))
+            yield Paragraph("可能的攻击向量", self.styles['Heading2'])
             for vector in surface.get('attack_vectors', []):
-                story.append(Paragraph(f"• {vector}", self.styles['Normal']))
+                yield Paragraph(f"• {vector}", self.styles['Normal'])
         
-        story.append(PageBreak())
+        yield PageBreak()
     
-    def _add_recommendations(self, story: list) -> None:
+    def _add_recommendations(self) -> Iterator['Flowable']:
         """添加修复建议"""
-        story.append(Paragraph("6. 修复建议", self.styles['Heading1']))
-        story.append(Spacer(1, 12))
+        from reportlab.platypus import Paragraph, Spacer, PageBreak
+        
+        yield Paragraph("6. 修复建议", self.styles['Heading1'])
+        yield Spacer(1, 12)
         
         if 'recommendations' in self.scan_results:
             for severity, items in self.scan_results['recommendations'].items():
-                story.append(Paragraph(
+                yield Paragraph(
                     f"{severity.upper()}级别建议",
                     self.styles[f'Risk{severity.capitalize()}']
-                ))
-                story.append(Spacer(1, 6))
+                )
+                yield Spacer(1, 6)
                 
                 for item in items:
-                    story.append(Paragraph(f"• {item['recommendation']}", self.styles['Normal']))
-                    story.append(Spacer(1, 3))
+                    yield Paragraph(f"• {item['recommendation']}", self.styles['Normal'])
+                    yield Spacer(1, 3)
         
-        story.append(PageBreak())
+        yield PageBreak()
     
-    def _add_technical_details(self, story: list) -> None:
+    def _add_technical_details(self) -> Iterator['Flowable']:
         """添加技术细节"""
-        story.append(Paragraph("7. 技术细节", self.styles['Heading1']))
-        story.append(Spacer(1, 12))
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Paragraph, Spacer, LongTable, PageBreak
+        
+        yield Paragraph("7. 技术细节", self.styles['Heading1'])
+        yield Spacer(1, 12)
         
         # 端口扫描结果
         if 'port_scan' in self.scan_results:
-            story.append(Paragraph("端口扫描详情", self.styles['Heading2']))
-            story.append(Spacer(1, 6))
+            yield Paragraph("端口扫描详情", self.styles['Heading2'])
+            yield Spacer(1, 6)
             
             scan_data = [['主机', '端口', '服务', '版本']]
-            for host, data in self.scan_results['port_scan'].items():
-                for proto in data.get('protocols', {}):
-                    for port, info in data['protocols'][proto].items():
-                        scan_data.append([
-                            host,
-                            f"{port}/{proto}",
-                            info['service'],
-                            info.get('version', 'unknown')
-                        ])
+            scan_data.extend(
+                [host, f"{port}/{proto}", service, version]
+                for host, port, proto, service, version in self._port_rows
+            )
             
-            t = Table(scan_data, colWidths=[2*inch, inch, 1.5*inch, 2*inch])
-            t.setStyle(TableStyle([
-                ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-                ('GRID', (0,0), (-1,-1), 1, colors.black),
-                ('BACKGROUND', (0,0), (-1,0), colors.grey)
-            ]))
-            story.append(t)
+            # 端口表可能跨越多页，LongTable按行拆分时无需反复计算整表布局
+            t = LongTable(scan_data, colWidths=[2*inch, inch, 1.5*inch, 2*inch], repeatRows=1, splitByRow=1)
+            t.setStyle(_grid_style())
+            yield t
         
-        story.append(PageBreak())
+        yield PageBreak()
     
-    def _add_appendices(self, story: list) -> None:
+    def _add_appendices(self) -> Iterator['Flowable']:
         """添加附录"""
-        story.append(Paragraph("8. 附录", self.styles['Heading1']))
-        story.append(Spacer(1, 12))
+        from reportlab.platypus import Paragraph, Spacer, Preformatted, PageBreak
+        
+        yield Paragraph("8. 附录", self.styles['Heading1'])
+        yield Spacer(1, 12)
         
         # 工具列表
-        story.append(Paragraph("使用的工具", self.styles['Heading2']))
+        yield Paragraph("使用的工具", self.styles['Heading2'])
         tools = [
             "nmap - 网络扫描",
             "nikto - Web漏洞扫描",
@@ -642,7 +787,61 @@ class ReportGenerator:
         ]
         
         for tool in tools:
-            story.append(Paragraph(f"• {tool}", self.styles['Normal']))
-            story.append(Spacer(1, 3))
+            yield Paragraph(f"• {tool}", self.styles['Normal'])
+            yield Spacer(1, 3)
+        
+        # 原始扫描数据
+        if self.include_appendix:
+            yield Spacer(1, 12)
+            yield Paragraph("原始扫描数据", self.styles['Heading2'])
+            yield Preformatted(
+                self._render_appendix_text(),
+                self.styles['Code'],
+                maxLineLength=_APPENDIX_LINE_LENGTH
+            )
         
-        story.append(PageBreak()) 
\ No newline at end of file
+        yield PageBreak() 
+
+# PDF章节，按报告中的顺序排列
+_PDF_CHAPTERS = (
+    '_add_cover_page',            # 封面
+    '_add_table_of_contents',     # 目录
+    '_add_executive_summary',     # 执行摘要
+    '_add_scope',                 # 测试范围
+    '_add_risk_assessment',       # 风险评估
+    '_add_vulnerabilities',       # 漏洞发现
+    '_add_attack_surface',        # 攻击面分析
+    '_add_recommendations',       # 修复建议
+    '_add_technical_details',     # 技术细节
+    '_add_appendices'             # 附录
+)
+
+# 章节渲染进程内的报告实例
+_chapter_report = None
+
+def _init_chapter_worker(target: str, scan_results: Dict[str, Any], timestamp: str, include_appendix: bool) -> None:
+    """初始化章节渲染进程"""
+    global _chapter_report
+    _chapter_report = ReportGenerator(target, scan_results, include_appendix)
+    _chapter_report.timestamp = timestamp
+
+def _render_chapter(chapter: str) -> bytes:
+    """在渲染进程中排版一个章节"""
+    return _build_chapter_pdf(_chapter_report, chapter)
+
+def _build_chapter_pdf(report: ReportGenerator, chapter: str) -> bytes:
+    """单独排版一个章节，返回该章节的PDF内容"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate
+    
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72
+    )
+    doc.build(_FlowableFeed(getattr(report, chapter)()))
+    return buffer.getvalue() 
\ No newline at end of file
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
-from typing import Dict, Any, List
+import numpy as np
+import orjson
+from collections import defaultdict
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+from typing import Dict, Any, List, Tuple, Optional
 from rich.console import Console
 from dataclasses import dataclass
 from enum import Enum
@@ -23,7 +27,10 @@ class ThreatLevel(Enum):
     MEDIUM = "medium"
     LOW = "low"
 
-@dataclass
+# 计入高风险威胁的等级
+_HIGH_LEVELS = frozenset({ThreatLevel.CRITICAL, ThreatLevel.HIGH})
+
+@dataclass(slots=True)
 class Asset:
     name: str
     type: AssetType
@@ -32,7 +39,7 @@ class Asset:
     services: List[str]
     description: str
 
-@dataclass
+@dataclass(slots=True)
 class Threat:
     name: str
     level: ThreatLevel
@@ -40,56 +47,173 @@ class Threat:
     impact: int     # 1-10
     description: str
     affected_assets: List[str]
-    attack_vectors: List[str]
+    attack_vectors: Tuple[str, ...]
+
+# 序列化字段，枚举字段在转换时取其值
+_ASSET_KEYS = ('name', 'type', 'value', 'exposed', 'services', 'description')
+_THREAT_KEYS = ('name', 'level', 'likelihood', 'impact', 'description', 'affected_assets', 'attack_vectors')
+_asset_fields = attrgetter(*_ASSET_KEYS)
+_threat_fields = attrgetter(*_THREAT_KEYS)
+_port_service = itemgetter('service')
+
+# 资产识别规则: (资产类型, 资产价值, 名称模板, 描述模板)
+_WEB_SERVER_SPEC = (AssetType.WEB_SERVER, 8, "Web Server ({host}:{port})", "Web服务器 运行 {product} {version}")
+_DATABASE_SPEC = (AssetType.DATABASE, 9, "Database Server ({host}:{port})", "数据库服务器 运行 {product} {version}")
+_DOMAIN_CONTROLLER_SPEC = (AssetType.DOMAIN_CONTROLLER, 10, "Domain Controller ({host})", "域控制器")
+
+# 服务名 -> 资产识别规则
+_SERVICE_MAP: Dict[str, Tuple[AssetType, int, str, str]] = {
+    'http': _WEB_SERVER_SPEC,
+    'https': _WEB_SERVER_SPEC,
+    'mysql': _DATABASE_SPEC,
+    'mssql': _DATABASE_SPEC,
+    'postgresql': _DATABASE_SPEC,
+    'mongodb': _DATABASE_SPEC,
+    'ldap': _DOMAIN_CONTROLLER_SPEC,
+    'kerberos': _DOMAIN_CONTROLLER_SPEC
+}
+
+# 未识别服务名时，LDAP端口同样视为域控制器
+_LDAP_PORT = 389
+
+_WEB_SUGGESTIONS = (
+    "实施Web应用防火墙(WAF)",
+    "启用HTTPS并配置安全headers",
+    "实施输入验证和输出编码"
+)
+_DATABASE_SUGGESTIONS = (
+    "限制数据库服务器访问",
+    "实施强密码策略",
+    "定期备份数据库"
+)
+
+# 暴露服务 -> 缓解建议
+_SERVICE_SUGGESTIONS: Dict[str, Tuple[str, ...]] = {
+    'http': _WEB_SUGGESTIONS,
+    'https': _WEB_SUGGESTIONS,
+    'mysql': _DATABASE_SUGGESTIONS,
+    'mssql': _DATABASE_SUGGESTIONS,
+    'postgresql': _DATABASE_SUGGESTIONS
+}
+
+# 攻击向量关键字 -> 缓解建议，按顺序匹配第一个命中的关键字
+_VECTOR_KEYWORD_SUGGESTIONS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('注入', (
+        "使用参数化查询",
+        "实施输入验证",
+        "最小权限原则"
+    )),
+    ('跨站', (
+        "实施CSP策略",
+        "使用安全的Cookie标志",
+        "输入验证和输出编码"
+    ))
+)
+
+# 以下评分函数只依赖finding中的基本类型字段，按字段值缓存
+@lru_cache(maxsize=1024)
+def _determine_threat_level(severity: Optional[str]) -> ThreatLevel:
+    """确定威胁等级"""
+    if severity is not None:
+        severity = severity.lower()
+        if severity == 'critical':
+            return ThreatLevel.CRITICAL
+        elif severity == 'high':
+            return ThreatLevel.HIGH
+        elif severity == 'medium':
+            return ThreatLevel.MEDIUM
+        else:
+            return ThreatLevel.LOW
+    return ThreatLevel.MEDIUM
+
+@lru_cache(maxsize=1024)
+def _calculate_likelihood(vuln_type: Optional[str], difficulty: Optional[str]) -> int:
+    """计算威胁发生的可能性"""
+    base_score = 5
+    
+    # 根据漏洞类型调整
+    if vuln_type in ('rce', 'sqli', 'upload'):
+        base_score += 3
+    elif vuln_type in ('xss', 'csrf'):
+        base_score += 2
+    
+    # 根据难度调整
+    if difficulty == 'easy':
+        base_score += 2
+    elif difficulty == 'hard':
+        base_score -= 2
+    
+    return max(1, min(10, base_score))
+
+@lru_cache(maxsize=1024)
+def _calculate_impact(impact: Optional[str]) -> int:
+    """计算威胁影响"""
+    base_score = 5
+    
+    # 根据影响范围调整
+    if impact is not None:
+        impact = impact.lower()
+        if 'system' in impact or 'root' in impact:
+            base_score += 4
+        elif 'data' in impact or 'confidential' in impact:
+            base_score += 3
+        elif 'user' in impact:
+            base_score += 2
+    
+    return max(1, min(10, base_score))
+
+def _json_default(obj: Any) -> Any:
+    """序列化orjson不支持的类型：集合与枚举"""
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError
 
 class ThreatModeling:
     def __init__(self):
         self.results: Dict[str, Any] = {}
         self.assets: List[Asset] = []
         self.threats: List[Threat] = []
+        # 资产名 -> 影响该资产的威胁下标，随威胁列表增量维护
+        self._asset_to_threats: Dict[str, List[int]] = defaultdict(list)
+        self._indexed_threats = 0
     
     def analyze_assets(self, scan_results: Dict[str, Any]) -> List[Asset]:
         """分析目标系统资产"""
         try:
             # 从端口扫描结果分析资产
-            if 'port_scan' in scan_results:
-                for host, data in scan_results['port_scan'].items():
-                    for proto in data.get('protocols', {}):
-                        for port, info in data['protocols'][proto].items():
-                            # 识别Web服务器
-                            if info['service'] in ['http', 'https']:
-                                self.assets.append(Asset(
-                                    name=f"Web Server ({host}:{port})",
-                                    type=AssetType.WEB_SERVER,
-                                    value=8,
-                                    exposed=True,
-                                    services=[info['service']],
-                                    description=f"Web服务器 运行 {info.get('product', '')} {info.get('version', '')}"
-                                ))
-                            
-                            # 识别数据库服务器
-                            elif info['service'] in ['mysql', 'mssql', 'postgresql', 'mongodb']:
-                                self.assets.append(Asset(
-                                    name=f"Database Server ({host}:{port})",
-                                    type=AssetType.DATABASE,
-                                    value=9,
-                                    exposed=True,
-                                    services=[info['service']],
-                                    description=f"数据库服务器 运行 {info.get('product', '')} {info.get('version', '')}"
-                                ))
-                            
-                            # 识别域控制器
-                            elif port == 389 or info['service'] in ['ldap', 'kerberos']:
-                                self.assets.append(Asset(
-                                    name=f"Domain Controller ({host})",
-                                    type=AssetType.DOMAIN_CONTROLLER,
-                                    value=10,
-                                    exposed=True,
-                                    services=[info['service']],
-                                    description="域控制器"
-                                ))
+            port_scan = scan_results.get('port_scan')
+            if port_scan:
+                entries = (
+                    (host, port, info)
+                    for host, data in port_scan.items()
+                    for ports in data.get('protocols', {}).values()
+                    for port, info in ports.items()
+                )
+                for host, port, info in entries:
+                    # 按服务名识别Web服务器、数据库服务器与域控制器
+                    service = _port_service(info)
+                    spec = _SERVICE_MAP.get(service)
+                    if spec is None:
+                        if port != _LDAP_PORT:
+                            continue
+                        spec = _DOMAIN_CONTROLLER_SPEC
+                    
+                    asset_type, value, name_template, description_template = spec
+                    self.assets.append(Asset(
+                        name=name_template.format(host=host, port=port),
+                        type=asset_type,
+                        value=value,
+                        exposed=True,
+                        services=[service],
+                        description=description_template.format(
+                            product=info.get('product', ''),
+                            version=info.get('version', '')
+                        )
+                    ))
             
-            self.results['assets'] = [self._asset_to_dict(asset) for asset in self.assets]
+            self.results['assets'] = list(map(self._asset_to_dict, self.assets))
             return self.assets
             
         except Exception as e:
@@ -108,9 +232,9 @@ class ThreatModeling:
                                 # 创建威胁对象
                                 threat = Threat(
                                     name=f"Vulnerability in {service_type}",
-                                    level=self._determine_threat_level(findings),
-                                    likelihood=self._calculate_likelihood(findings),
-                                    impact=self._calculate_impact(findings),
+                                    level=_determine_threat_level(findings.get('severity')),
+                                    likelihood=_calculate_likelihood(findings.get('type'), findings.get('difficulty')),
+                                    impact=_calculate_impact(findings.get('impact')),
                                     description=findings.get('details', '未知漏洞'),
                                     affected_assets=[asset.name for asset in self.assets if service_type in asset.services],
                                     attack_vectors=self._identify_attack_vectors(findings)
@@ -128,11 +252,12 @@ class ThreatModeling:
                         impact=8,
                         description="检测到WAF可能被绕过",
                         affected_assets=[asset.name for asset in self.assets if asset.type == AssetType.WEB_SERVER],
-                        attack_vectors=["WAF绕过", "注入攻击"]
+                        attack_vectors=("WAF绕过", "注入攻击")
                     )
                     self.threats.append(threat)
             
-            self.results['threats'] = [self._threat_to_dict(threat) for threat in self.threats]
+            self._index_threats()
+            self.results['threats'] = list(map(self._threat_to_dict, self.threats))
             return self.threats
             
         except Exception as e:
@@ -142,31 +267,24 @@ class ThreatModeling:
     def calculate_risk_scores(self) -> Dict[str, float]:
         """计算风险评分"""
         try:
-            risk_scores = {}
+            self._index_threats()
             
-            for asset in self.assets:
-                # 基础风险分数
-                base_score = asset.value * 10  # 0-100
-                
-                # 受影响的威胁数量
-                affecting_threats = [
-                    threat for threat in self.threats
-                    if asset.name in threat.affected_assets
-                ]
-                
-                # 威胁加权
-                threat_score = sum(
-                    threat.likelihood * threat.impact
-                    for threat in affecting_threats
-                ) if affecting_threats else 0
-                
-                # 暴露程度调整
-                exposure_multiplier = 1.5 if asset.exposed else 1.0
-                
-                # 最终风险分数
-                final_score = (base_score + threat_score) * exposure_multiplier
-                
-                risk_scores[asset.name] = min(100, final_score)  # 上限100
+            # 资产-威胁关联矩阵
+            incidence = np.zeros((len(self.assets), len(self.threats)), dtype=np.int8)
+            for i, asset in enumerate(self.assets):
+                incidence[i, self._asset_to_threats.get(asset.name, [])] = 1
+            
+            # 基础风险分数 0-100
+            values = np.fromiter((asset.value for asset in self.assets), dtype=np.int64, count=len(self.assets))
+            # 威胁加权 likelihood * impact
+            likelihood = np.fromiter((threat.likelihood for threat in self.threats), dtype=np.int64, count=len(self.threats))
+            impact = np.fromiter((threat.impact for threat in self.threats), dtype=np.int64, count=len(self.threats))
+            # 暴露程度调整
+            exposure = np.where([asset.exposed for asset in self.assets], 1.5, 1.0)
+            
+            # 最终风险分数，上限100
+            scores = np.minimum(100, (values * 10 + incidence @ (likelihood * impact)) * exposure)
+            risk_scores = dict(zip((asset.name for asset in self.assets), scores.tolist()))
             
             self.results['risk_scores'] = risk_scores
             return risk_scores
@@ -175,40 +293,53 @@ class ThreatModeling:
             console.print(f"[red]风险评分计算失败: {str(e)}[/red]")
             return {}
     
+    def _index_threats(self) -> None:
+        """为新增的威胁建立资产名索引，威胁列表被替换或缩短时整体重建"""
+        if self._indexed_threats > len(self.threats):
+            self._asset_to_threats.clear()
+            self._indexed_threats = 0
+        
+        for t in range(self._indexed_threats, len(self.threats)):
+            for name in self.threats[t].affected_assets:
+                self._asset_to_threats[name].append(t)
+        self._indexed_threats = len(self.threats)
+    
     def generate_attack_surface_report(self) -> Dict[str, Any]:
         """生成攻击面分析报告"""
         try:
-            report = {
-                'exposed_services': [],
-                'critical_assets': [],
-                'high_risk_threats': [],
-                'attack_vectors': set(),
-                'mitigation_suggestions': []
-            }
+            exposed_services = set()
+            critical_assets = []
+            high_risk_threats = []
+            attack_vectors = set()
             
-            # 分析暴露的服务
+            # 单次遍历资产：暴露的服务(去重)与关键资产
             for asset in self.assets:
                 if asset.exposed:
-                    report['exposed_services'].extend(asset.services)
-            
-            # 识别关键资产
-            for asset in self.assets:
+                    exposed_services.update(asset.services)
                 if asset.value >= 8:
-                    report['critical_assets'].append({
+                    critical_assets.append({
                         'name': asset.name,
                         'type': asset.type.value,
                         'description': asset.description
                     })
             
-            # 高风险威胁
+            # 单次遍历威胁：高风险威胁及其攻击向量
             for threat in self.threats:
-                if threat.level in [ThreatLevel.CRITICAL, ThreatLevel.HIGH]:
-                    report['high_risk_threats'].append({
+                if threat.level in _HIGH_LEVELS:
+                    high_risk_threats.append({
                         'name': threat.name,
                         'level': threat.level.value,
                         'description': threat.description
                     })
-                    report['attack_vectors'].update(threat.attack_vectors)
+                    attack_vectors.update(threat.attack_vectors)
+            
+            report = {
+                'exposed_services': exposed_services,
+                'critical_assets': critical_assets,
+                'high_risk_threats': high_risk_threats,
+                'attack_vectors': frozenset(attack_vectors),
+                'mitigation_suggestions': []
+            }
             
             # 生成缓解建议
             report['mitigation_suggestions'] = self._generate_mitigation_suggestions(
@@ -223,57 +354,7 @@ class ThreatModeling:
             console.print(f"[red]攻击面分析失败: {str(e)}[/red]")
             return {}
     
-    def _determine_threat_level(self, finding: Dict[str, Any]) -> ThreatLevel:
-        """确定威胁等级"""
-        if 'severity' in finding:
-            severity = finding['severity'].lower()
-            if severity == 'critical':
-                return ThreatLevel.CRITICAL
-            elif severity == 'high':
-                return ThreatLevel.HIGH
-            elif severity == 'medium':
-                return ThreatLevel.MEDIUM
-            else:
-                return ThreatLevel.LOW
-        return ThreatLevel.MEDIUM
-    
-    def _calculate_likelihood(self, finding: Dict[str, Any]) -> int:
-        """计算威胁发生的可能性"""
-        base_score = 5
-        
-        # 根据漏洞类型调整
-        if 'type' in finding:
-            if finding['type'] in ['rce', 'sqli', 'upload']:
-                base_score += 3
-            elif finding['type'] in ['xss', 'csrf']:
-                base_score += 2
-        
-        # 根据难度调整
-        if 'difficulty' in finding:
-            if finding['difficulty'] == 'easy':
-                base_score += 2
-            elif finding['difficulty'] == 'hard':
-                base_score -= 2
-        
-        return max(1, min(10, base_score))
-    
-    def _calculate_impact(self, finding: Dict[str, Any]) -> int:
-        """计算威胁影响"""
-        base_score = 5
-        
-        # 根据影响范围调整
-        if 'impact' in finding:
-            impact = finding['impact'].lower()
-            if 'system' in impact or 'root' in impact:
-                base_score += 4
-            elif 'data' in impact or 'confidential' in impact:
-                base_score += 3
-            elif 'user' in impact:
-                base_score += 2
-        
-        return max(1, min(10, base_score))
-    
-    def _identify_attack_vectors(self, finding: Dict[str, Any]) -> List[str]:
+    def _identify_attack_vectors(self, finding: Dict[str, Any]) -> Tuple[str, ...]:
         """识别攻击向量"""
         vectors = []
         
@@ -288,72 +369,46 @@ class ThreatModeling:
         if 'method' in finding:
             vectors.append(finding['method'])
         
-        return list(set(vectors))
+        return tuple(set(vectors))
     
-    def _generate_mitigation_suggestions(self, exposed_services: List[str], attack_vectors: set) -> List[str]:
+    def _generate_mitigation_suggestions(self, exposed_services: set, attack_vectors: frozenset) -> List[str]:
         """生成缓解建议"""
-        suggestions = []
+        suggestions = set()
         
         # 基于暴露服务的建议
         for service in exposed_services:
-            if service in ['http', 'https']:
-                suggestions.extend([
-                    "实施Web应用防火墙(WAF)",
-                    "启用HTTPS并配置安全headers",
-                    "实施输入验证和输出编码"
-                ])
-            elif service in ['mysql', 'mssql', 'postgresql']:
-                suggestions.extend([
-                    "限制数据库服务器访问",
-                    "实施强密码策略",
-                    "定期备份数据库"
-                ])
+            suggestions.update(_SERVICE_SUGGESTIONS.get(service, ()))
         
         # 基于攻击向量的建议
         for vector in attack_vectors:
-            if '注入' in vector:
-                suggestions.extend([
-                    "使用参数化查询",
-                    "实施输入验证",
-                    "最小权限原则"
-                ])
-            elif '跨站' in vector:
-                suggestions.extend([
-                    "实施CSP策略",
-                    "使用安全的Cookie标志",
-                    "输入验证和输出编码"
-                ])
+            for keyword, vector_suggestions in _VECTOR_KEYWORD_SUGGESTIONS:
+                if keyword in vector:
+                    suggestions.update(vector_suggestions)
+                    break
         
-        return list(set(suggestions))
+        return list(suggestions)
     
     def _asset_to_dict(self, asset: Asset) -> Dict[str, Any]:
         """将Asset对象转换为字典"""
-        return {
-            'name': asset.name,
-            'type': asset.type.value,
-            'value': asset.value,
-            'exposed': asset.exposed,
-            'services': asset.services,
-            'description': asset.description
-        }
+        data = dict(zip(_ASSET_KEYS, _asset_fields(asset)))
+        data['type'] = asset.type.value
+        return data
     
     def _threat_to_dict(self, threat: Threat) -> Dict[str, Any]:
         """将Threat对象转换为字典"""
-        return {
-            'name': threat.name,
-            'level': threat.level.value,
-            'likelihood': threat.likelihood,
-            'impact': threat.impact,
-            'description': threat.description,
-            'affected_assets': threat.affected_assets,
-            'attack_vectors': threat.attack_vectors
-        }
+        data = dict(zip(_THREAT_KEYS, _threat_fields(threat)))
+        data['level'] = threat.level.value
+        return data
     
     def export_results(self, filepath: str) -> None:
         """导出威胁建模结果"""
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.results, f, indent=4, ensure_ascii=False)
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(
+                    self.results,
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+                    default=_json_default
+                ))
             console.print(f"[green]威胁建模结果已保存到: {filepath}[/green]")
         except Exception as e:
             console.print(f"[red]导出结果失败: {str(e)}[/red]") 
\ No newline at end of file
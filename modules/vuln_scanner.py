@@ -1,35 +1,98 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import subprocess
-import json
+import asyncio
+import functools
+import os
 import re
+import orjson
 from rich.console import Console
-from typing import Dict, Any, List
-from retry import retry
+from typing import Dict, Any, List, Optional, AsyncIterator, Sequence
 
 console = Console()
 
+# 同时运行的外部扫描进程数上限
+_MAX_CONCURRENT_SCANS = 8
+
+# 逐行读取进程输出时的单行长度上限
+_STREAM_LINE_LIMIT = 1 << 20
+
+# 外部扫描命令的固定参数，目标作为独立参数传入，不经过字符串拼接和分割
+_NIKTO_OPTIONS = ('-Format', 'json')
+_SQLMAP_OPTIONS = ('--batch', '--random-agent', '--level', '1', '--risk', '1')
+_SMB_VULN_OPTIONS = ('-p445', '--script', 'smb-vuln-ms17-010')
+
+# SQLMap结果目录，每个URL使用独立子目录，并发运行时会话与日志文件互不覆盖
+_SQLMAP_OUTPUT_DIR = './sqlmap_results'
+_UNSAFE_PATH_CHARS = re.compile(r'[^\w.-]+')
+
+# SQLMap输出中的注入参数
+_SQLI_PARAM_RE = re.compile(r'Parameter: (\w+)')
+
+def _async_retry(tries: int = 3, delay: float = 2):
+    """协程版本的重试装饰器"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(1, tries + 1):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    if attempt == tries:
+                        raise
+                    await asyncio.sleep(delay)
+        return wrapper
+    return decorator
+
+async def _stream_stdout(argv: Sequence[str]) -> AsyncIterator[str]:
+    """逐行读取外部进程的标准输出，输出读完后等待进程退出"""
+    process = await asyncio.create_subprocess_exec(
+        *argv,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        limit=_STREAM_LINE_LIMIT
+    )
+    try:
+        async for line in process.stdout:
+            yield line.decode(errors='replace')
+    finally:
+        # 读取被中断时结束进程，避免残留
+        if not process.stdout.at_eof():
+            process.kill()
+        await process.wait()
+
 class VulnScanner:
     def __init__(self, target: str, ports: List[int]):
         self.target = target
         self.ports = ports
         self.results: Dict[str, Any] = {}
+        # 限制并发外部进程数，在扫描所用的事件循环中创建
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环使用的并发限制，首次使用或事件循环变化时创建"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(_MAX_CONCURRENT_SCANS)
+            self._semaphore_loop = loop
+        return self._semaphore
     
-    @retry(tries=3, delay=2)
-    def run_nikto(self, port: int) -> Dict[str, Any]:
+    @_async_retry(tries=3, delay=2)
+    async def run_nikto(self, port: int) -> Dict[str, Any]:
         """运行Nikto Web漏洞扫描"""
         try:
-            cmd = f"nikto -h {self.target} -p {port} -Format json"
-            process = subprocess.Popen(
-                cmd.split(),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            output, error = process.communicate()
+            argv = ('nikto', '-h', self.target, '-p', str(port), *_NIKTO_OPTIONS)
+            async with self._get_semaphore():
+                process = await asyncio.create_subprocess_exec(
+                    *argv,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                output, error = await process.communicate()
             
             if process.returncode == 0:
-                return json.loads(output.decode())
+                return orjson.loads(output)
             else:
                 console.print(f"[red]Nikto扫描失败: {error.decode()}[/red]")
                 return {}
@@ -37,97 +100,107 @@ class VulnScanner:
             console.print(f"[red]Nikto执行错误: {str(e)}[/red]")
             return {}
     
-    @retry(tries=3, delay=2)
-    def run_sqlmap(self, url: str) -> Dict[str, Any]:
+    @_async_retry(tries=3, delay=2)
+    async def run_sqlmap(self, url: str) -> Dict[str, Any]:
         """运行SQLMap检测SQL注入"""
         try:
-            cmd = f"sqlmap -u {url} --batch --random-agent --level 1 --risk 1 --output-dir=./sqlmap_results"
-            process = subprocess.Popen(
-                cmd.split(),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            output, error = process.communicate()
-            
-            # 解析SQLMap输出
-            result = {
-                'vulnerable': False,
-                'injection_points': [],
-                'details': output.decode()
-            }
+            output_dir = os.path.join(_SQLMAP_OUTPUT_DIR, _UNSAFE_PATH_CHARS.sub('_', url))
+            argv = ('sqlmap', '-u', url, *_SQLMAP_OPTIONS, f'--output-dir={output_dir}')
+            lines = []
+            vulnerable = False
+            # SQLMap会多次输出同一参数，收集时去重
+            injection_points = set()
             
-            if 'SQL injection vulnerability has been detected' in output.decode():
-                result['vulnerable'] = True
-                # 提取注入点
-                injection_points = re.findall(r'Parameter: (\w+)', output.decode())
-                result['injection_points'] = injection_points
+            # 边读取边解析SQLMap输出
+            async with self._get_semaphore():
+                async for line in _stream_stdout(argv):
+                    lines.append(line)
+                    if not vulnerable and 'SQL injection vulnerability has been detected' in line:
+                        vulnerable = True
+                    # 提取注入点
+                    injection_points.update(match.group(1) for match in _SQLI_PARAM_RE.finditer(line))
             
-            return result
+            return {
+                'vulnerable': vulnerable,
+                'injection_points': sorted(injection_points) if vulnerable else [],
+                'details': ''.join(lines)
+            }
         except Exception as e:
             console.print(f"[red]SQLMap执行错误: {str(e)}[/red]")
             return {}
     
-    def check_smb_vuln(self) -> Dict[str, Any]:
+    async def check_smb_vuln(self) -> Dict[str, Any]:
         """检查SMB漏洞"""
         try:
             # 运行永恒之蓝检测脚本
-            cmd = f"nmap -p445 --script smb-vuln-ms17-010 {self.target}"
-            process = subprocess.Popen(
-                cmd.split(),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            output, error = process.communicate()
-            
-            result = {
-                'vulnerable': False,
-                'details': output.decode()
-            }
+            argv = ('nmap', *_SMB_VULN_OPTIONS, self.target)
+            lines = []
+            vulnerable = False
             
-            if 'VULNERABLE' in output.decode():
-                result['vulnerable'] = True
+            async with self._get_semaphore():
+                async for line in _stream_stdout(argv):
+                    lines.append(line)
+                    if not vulnerable and 'VULNERABLE' in line:
+                        vulnerable = True
             
-            return result
+            return {
+                'vulnerable': vulnerable,
+                'details': ''.join(lines)
+            }
         except Exception as e:
             console.print(f"[red]SMB漏洞检测错误: {str(e)}[/red]")
             return {}
     
-    def scan_web_service(self, port: int) -> Dict[str, Any]:
+    async def scan_web_service(self, port: int) -> Dict[str, Any]:
         """扫描Web服务漏洞"""
-        results = {}
-        
-        # 运行Nikto
         console.print(f"[blue]正在使用Nikto扫描Web服务 (端口 {port})...[/blue]")
-        results['nikto'] = self.run_nikto(port)
         
         # 检查常见Web路径
         target_url = f"http://{self.target}:{port}"
         common_paths = ['/admin', '/login', '/wp-admin', '/phpmyadmin']
         
         for path in common_paths:
-            url = f"{target_url}{path}"
-            console.print(f"[blue]正在检查SQL注入 ({url})...[/blue]")
-            results[f'sqlmap_{path}'] = self.run_sqlmap(url)
+            console.print(f"[blue]正在检查SQL注入 ({target_url}{path})...[/blue]")
+        
+        # Nikto与各路径的SQLMap检测并发执行
+        nikto_result, *sqlmap_results = await asyncio.gather(
+            self.run_nikto(port),
+            *(self.run_sqlmap(f"{target_url}{path}") for path in common_paths)
+        )
+        
+        results = {'nikto': nikto_result}
+        for path, result in zip(common_paths, sqlmap_results):
+            results[f'sqlmap_{path}'] = result
         
         return results
     
     def scan_all(self) -> Dict[str, Any]:
         """执行所有漏洞扫描"""
+        return asyncio.run(self.scan_all_async())
+    
+    async def scan_all_async(self) -> Dict[str, Any]:
+        """并发执行所有漏洞扫描"""
         console.print("[bold blue]开始漏洞扫描...[/bold blue]")
         
-        for port in self.ports:
+        scans = {}
+        # 端口去重，重复端口不会重复创建扫描任务
+        for port in dict.fromkeys(self.ports):
             if port in [80, 443, 8080]:  # Web端口
-                self.results[f'web_{port}'] = self.scan_web_service(port)
-            elif port == 445:  # SMB端口
-                self.results['smb'] = self.check_smb_vuln()
+                scans[f'web_{port}'] = self.scan_web_service(port)
+            elif port == 445 and 'smb' not in scans:  # SMB端口
+                scans['smb'] = self.check_smb_vuln()
+        
+        # 各服务的扫描互不依赖，同时进行
+        for name, result in zip(scans, await asyncio.gather(*scans.values())):
+            self.results[name] = result
         
         return self.results
     
     def export_json(self, filepath: str) -> None:
         """导出扫描结果为JSON格式"""
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.results, f, indent=4)
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(self.results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
             console.print(f"[green]漏洞扫描结果已保存到: {filepath}[/green]")
         except Exception as e:
-            console.print(f"[red]导出结果失败: {str(e)}[/red]") 
\ No newline at end of file
+            console.print(f"[red]导出结果失败: {str(e)}[/red]")
